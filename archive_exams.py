@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Exam Archiver for CTF Lab
+Moves finished sittings (students whose deadline has passed, with their
+submissions and submission history) out of web/ctf_lab.db into per-exam
+archive databases or compressed JSONL, leaves one summary row per sitting in
+exam_summaries, then runs ANALYZE and VACUUM so the live database stays small.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append('web')
+from db import BASE_DIR, DB_PATH, ensure_schema_locked, get_db_connection
+from exam_packs import load_exam_index
+from timekeeping import now_ms
+
+EXAMS = load_exam_index()
+
+# Passwords are deliberately not archived
+STUDENT_COLUMNS = ('id', 'roll_number', 'name', 'exam_id', 'login_at_ms', 'deadline_ms')
+
+
+def get_exam(exam_id):
+    """The student's exam pack, or the active one (CTF_EXAM) if they have none"""
+    return EXAMS.get(exam_id) or EXAMS[os.environ.get('CTF_EXAM', 'default')]
+
+
+def finished_sittings(conn, cutoff_ms, exam_filter=None):
+    """Map exam_id -> ids of students whose deadline is before cutoff_ms"""
+    sittings = {}
+    rows = conn.execute('SELECT id, exam_id FROM students WHERE deadline_ms IS NOT NULL AND deadline_ms <= ?',
+                        (cutoff_ms,))
+    for row in rows:
+        exam_id = get_exam(row['exam_id']).id
+        if exam_filter is None or exam_id == exam_filter:
+            sittings.setdefault(exam_id, []).append(row['id'])
+    return sittings
+
+
+def select_sitting(conn, student_ids):
+    """Put the sitting's student ids in temp.sitting, which queries join on
+    (a plain IN list would hit SQLite's variable limit on large rosters)"""
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS sitting (id INTEGER PRIMARY KEY)')
+    conn.execute('DELETE FROM temp.sitting')
+    conn.executemany('INSERT INTO temp.sitting (id) VALUES (?)', ((i,) for i in student_ids))
+
+
+def select_rows(conn, sql):
+    return [dict(row) for row in conn.execute(sql)]
+
+
+def collect(conn, exam_id, student_ids):
+    """Read one sitting and build its summary row"""
+    select_sitting(conn, student_ids)
+    students = select_rows(conn, f"SELECT {', '.join(STUDENT_COLUMNS)} FROM students "
+                                 f"WHERE id IN (SELECT id FROM temp.sitting)")
+    submissions = select_rows(conn, 'SELECT * FROM submissions WHERE student_id IN (SELECT id FROM temp.sitting)')
+    history = select_rows(conn, 'SELECT * FROM submission_history '
+                                'WHERE student_id IN (SELECT id FROM temp.sitting)')
+
+    started_at = min(s['login_at_ms'] or s['deadline_ms'] for s in students)
+    sitting_id = base_id = f"{exam_id}-{time.strftime('%Y%m%d-%H%M', time.gmtime(started_at / 1000))}"
+    suffix = 1
+    while conn.execute('SELECT 1 FROM exam_summaries WHERE sitting_id = ?', (sitting_id,)).fetchone():
+        suffix += 1
+        sitting_id = f'{base_id}-{suffix}'
+
+    scores = [s['score'] for s in submissions if s['score'] is not None]
+    summary = {
+        'sitting_id': sitting_id,
+        'exam_id': exam_id,
+        'started_at_ms': started_at,
+        'ended_at_ms': max(s['deadline_ms'] for s in students),
+        'students': len(students),
+        'submissions': len(submissions),
+        'attempts': len(history),
+        'avg_score': sum(scores) / len(scores) if scores else None,
+        'max_score': max(scores) if scores else None,
+        'perfect_scores': sum(score == len(get_exam(exam_id).questions) for score in scores),
+    }
+    return summary, {'students': students, 'submissions': submissions, 'submission_history': history}
+
+
+def write_sqlite(path, summary, tables):
+    """Append a sitting to the exam's archive database"""
+    archive = sqlite3.connect(path)
+    with archive:
+        for name, rows in [('sittings', [summary])] + list(tables.items()):
+            if not rows:
+                continue
+            columns = list(rows[0])
+            if name != 'sittings':
+                columns = ['sitting_id'] + columns
+            archive.execute(f"CREATE TABLE IF NOT EXISTS {name} ({', '.join(columns)})")
+            key = 'sitting_id' if name == 'sittings' else 'sitting_id, id'
+            archive.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{name}_key ON {name} ({key})")
+            archive.executemany(
+                f"INSERT OR REPLACE INTO {name} ({', '.join(columns)}) VALUES ({','.join('?' * len(columns))})",
+                [[summary['sitting_id']] * (name != 'sittings') + list(row.values()) for row in rows])
+    archive.close()
+
+
+def write_jsonl(path, summary, tables):
+    """Write a sitting as gzipped JSON lines, summary first"""
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({'table': 'sittings', 'row': summary}) + '\n')
+        for name, rows in tables.items():
+            for row in rows:
+                f.write(json.dumps({'table': name, 'row': row}) + '\n')
+
+
+def archive_sitting(conn, exam_id, student_ids, args):
+    summary, tables = collect(conn, exam_id, student_ids)
+    if args.format == 'sqlite':
+        path = os.path.join(args.archive_dir, f'{exam_id}.db')
+        write_sqlite(path, summary, tables)
+    else:
+        path = os.path.join(args.archive_dir, f"{summary['sitting_id']}.jsonl.gz")
+        write_jsonl(path, summary, tables)
+
+    # The archive is written first, so a crash here only means re-archiving
+    # the same rows, which replaces them
+    with conn:
+        conn.execute('DELETE FROM submission_history WHERE student_id IN (SELECT id FROM temp.sitting)')
+        conn.execute('DELETE FROM submissions WHERE student_id IN (SELECT id FROM temp.sitting)')
+        conn.execute('UPDATE students SET login_at_ms = NULL, deadline_ms = NULL '
+                     'WHERE id IN (SELECT id FROM temp.sitting)')
+        stored_path = os.path.relpath(path, BASE_DIR)
+        if stored_path.startswith('..'):
+            stored_path = os.path.abspath(path)
+        columns = list(summary) + ['archive_path', 'archived_at_ms']
+        conn.execute(f"INSERT INTO exam_summaries ({', '.join(columns)}) VALUES ({','.join('?' * len(columns))})",
+                     list(summary.values()) + [stored_path, now_ms()])
+    return summary, path
+
+
+def compact(conn):
+    """ANALYZE and VACUUM the live database, returning (bytes before, after)"""
+    before = os.path.getsize(DB_PATH)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.execute('VACUUM')
+    return before, os.path.getsize(DB_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive finished CTF Lab sittings and compact the database")
+    parser.add_argument('--exam', help="only archive this exam id")
+    parser.add_argument('--format', choices=('sqlite', 'jsonl'), default='sqlite',
+                        help="per-exam archive database (default) or one .jsonl.gz per sitting")
+    parser.add_argument('--archive-dir', default=os.path.join(BASE_DIR, 'archive'))
+    parser.add_argument('--grace-minutes', type=int, default=15,
+                        help="only archive students whose deadline passed at least this long ago")
+    parser.add_argument('--dry-run', action='store_true', help="show what would be archived")
+    args = parser.parse_args()
+
+    if args.exam and args.exam not in EXAMS:
+        print(f"❌ Unknown exam '{args.exam}'")
+        sys.exit(1)
+
+    ensure_schema_locked()
+    conn = get_db_connection()
+    sittings = finished_sittings(conn, now_ms() - args.grace_minutes * 60_000, args.exam)
+    if not sittings:
+        # Nothing moved, so don't take VACUUM's exclusive lock on the live DB
+        print("✅ No finished sittings to archive")
+        return
+    for exam_id, student_ids in sorted(sittings.items()):
+        if args.dry_run:
+            print(f"📦 Would archive {len(student_ids)} students of exam '{exam_id}'")
+            continue
+        os.makedirs(args.archive_dir, exist_ok=True)
+        summary, path = archive_sitting(conn, exam_id, student_ids, args)
+        print(f"📦 Archived {summary['sitting_id']}: {summary['students']} students, "
+              f"{summary['submissions']} submissions, {summary['attempts']} attempts -> {path}")
+
+    if not args.dry_run:
+        before, after = compact(conn)
+        print(f"🧹 Live database {before / 1024:.0f} KB -> {after / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
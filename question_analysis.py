@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Question Analysis for CTF Lab
+Instructors can use this to see how each question performed in a sitting:
+difficulty, discrimination and the wrong answers (decoy flags) students
+fell for. Works on the live database or on an archive from archive_exams.py.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.append('web')
+from analytics import analyze
+from exam_packs import load_exam_index
+
+
+def print_report(result):
+    print("=" * 60)
+    label = f" sitting {result['sitting_id']}" if result['sitting_id'] else ""
+    print(f"QUESTION ANALYSIS: {result['exam_id']}{label}")
+    print("=" * 60)
+    if not result['submissions']:
+        print("No submissions yet")
+        return
+    print(f"Submissions: {result['submissions']}, Average Score: {result['average_score']:.2f}"
+          f" (analysed in {result['elapsed_ms']:.0f} ms)")
+    for q in result['questions']:
+        rpb = f"{q['point_biserial']:.2f}" if q['point_biserial'] is not None else "-"
+        print(f"\n📝 {q['id'].upper()} {q['title']}")
+        print(f"  Correct: {q['difficulty']:.0%}   Discrimination: {q['discrimination']:.2f}   Point-biserial: {rpb}")
+        if q['discrimination'] < 0.2:
+            print("  ⚠️  Weak discrimination: strong and weak students do about equally well")
+        if q['blank']:
+            print(f"  Blank: {q['blank']}")
+        for answer, count in q['wrong_answers']:
+            print(f"  ❌ {count:>6}  {answer[:60]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-question analysis of a CTF Lab exam sitting")
+    parser.add_argument('--exam', default=os.environ.get('CTF_EXAM', 'default'), help="exam id")
+    parser.add_argument('--db', default=os.path.join('web', 'ctf_lab.db'),
+                        help="live database, or an archive database with --sitting")
+    parser.add_argument('--sitting', help="sitting id inside an archive database")
+    args = parser.parse_args()
+
+    exams = load_exam_index()
+    if args.exam not in exams:
+        print(f"❌ Unknown exam '{args.exam}' (have: {', '.join(exams)})")
+        sys.exit(1)
+    if not os.path.exists(args.db):
+        print(f"Database not found at {args.db}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(args.db)
+    print_report(analyze(conn, exams[args.exam], sitting_id=args.sitting))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
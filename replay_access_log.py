@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Access Log Replay for CTF Lab
+Replays a recorded exam (written when the app runs with CTF_ACCESS_LOG set)
+against a local instance at 1x, 5x or 10x speed and reports, per slice of
+the recording, where latency degrades: SQLite (including lock waits), password
+hashing or template rendering. With --summary the recording itself is
+analysed offline without sending any requests.
+
+The target instance must run with CTF_SERVER_TIMING=1 so each response
+carries its phase timings.
+"""
+
+import argparse
+import http.cookiejar
+import os
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('web')
+from accesslog import iter_records
+
+# Histogram bucket upper bounds in ms; percentiles are read off these so a
+# window costs the same memory however many requests it holds
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 2, 3, 5, 7, 10, 15, 20, 30, 50, 75, 100, 150, 200, 300,
+              500, 750, 1000, 1500, 2000, 3000, 5000, 10000, float('inf'))
+
+PHASES = ('db', 'hash', 'render', 'other')
+
+# A window only counts as degraded if its p95 also grew by this much, so
+# jitter between sub-millisecond buckets on fast routes isn't flagged
+MIN_DEGRADATION_MS = 1.0
+
+
+class Window:
+    """Latency histogram and phase totals for one slice of recorded time"""
+
+    def __init__(self, index, seconds):
+        self.index = index
+        self.seconds = seconds
+        self.count = 0
+        self.errors = 0
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.max_ms = 0.0
+        self.phase_ms = dict.fromkeys(PHASES, 0.0)
+        self.max_lag_ms = 0.0
+        self.pending = 0
+
+    def add(self, latency_ms, phases, error=False):
+        self.count += 1
+        self.errors += error
+        self.max_ms = max(self.max_ms, latency_ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if latency_ms <= bound:
+                self.buckets[i] += 1
+                break
+        known = 0.0
+        for name in ('db', 'hash', 'render'):
+            self.phase_ms[name] += phases.get(name, 0.0)
+            known += phases.get(name, 0.0)
+        self.phase_ms['other'] += max(0.0, latency_ms - known)
+
+    def percentile(self, p):
+        target = self.count * p
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def phase_avg(self, name):
+        return self.phase_ms[name] / self.count if self.count else 0.0
+
+
+class Report:
+    """Prints windows in order as they complete and flags degradation"""
+
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        self.baseline = None
+        self.total = 0
+        self.degraded = 0
+
+    def header(self):
+        print(f"{'offset':>8} {'reqs':>6} {'req/s':>7} {'p50':>7} {'p95':>7} {'max':>8}"
+              f" {'db':>7} {'hash':>7} {'render':>7} {'other':>7}  note")
+        print("-" * 100)
+
+    def window(self, w):
+        self.total += w.count
+        p50, p95 = w.percentile(0.50), w.percentile(0.95)
+        # Compare against the fastest busy window so far
+        if w.count >= 10 and (self.baseline is None or p95 < self.baseline.percentile(0.95)):
+            self.baseline = w
+        note = ''
+        base_p95 = self.baseline.percentile(0.95) if self.baseline is not None else None
+        if (base_p95 is not None and w is not self.baseline
+                and p95 > 2 * base_p95 and p95 - base_p95 >= MIN_DEGRADATION_MS):
+            self.degraded += 1
+            growth = {name: w.phase_avg(name) - self.baseline.phase_avg(name) for name in PHASES}
+            worst = max(growth, key=growth.get)
+            label = {'db': 'db (SQLite incl. lock waits)', 'other': 'other (worker queueing?)'}.get(worst, worst)
+            note = f"⚠️  p95 {p95 / base_p95:.1f}x baseline, mostly {label} +{growth[worst]:.1f} ms/req"
+        if w.errors:
+            note += f" ❌ {w.errors} errors"
+        if w.max_lag_ms > 1000:
+            note += f" ⏳ replay {w.max_lag_ms / 1000:.1f}s behind schedule"
+        offset = w.index * self.window_seconds
+        print(f"{offset // 3600:>2}:{offset % 3600 // 60:02}:{offset % 60:02} {w.count:>6} {w.count / self.window_seconds:>7.1f}"
+              f" {p50:>7.2f} {p95:>7.2f} {w.max_ms:>8.2f}"
+              + ''.join(f" {w.phase_avg(name):>7.2f}" for name in PHASES) + f"  {note}", flush=True)
+
+    def footer(self):
+        print("-" * 100)
+        print(f"📊 {self.total} requests, {self.degraded} degraded windows")
+        print("   Latencies in ms; phases are per-request averages. 'other' is time outside")
+        print("   db/hash/render: waiting for a free worker, network and Python overhead.")
+
+
+class WindowQueue:
+    """Open windows keyed by index, flushed to the report in order once drained"""
+
+    def __init__(self, report, window_seconds):
+        self.report = report
+        self.window_seconds = window_seconds
+        self.windows = {}
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+    def get(self, offset_s):
+        index = int(offset_s // self.window_seconds)
+        with self.lock:
+            window = self.windows.get(index)
+            if window is None:
+                window = self.windows[index] = Window(index, self.window_seconds)
+            return window
+
+    def flush(self, upto=None):
+        with self.lock:
+            while self.windows and (upto is None or self.next_index < upto):
+                window = self.windows.get(self.next_index)
+                if window is not None:
+                    if window.pending:
+                        break
+                    self.report.window(window)
+                    del self.windows[self.next_index]
+                self.next_index += 1
+
+
+def collapse_idle(records, max_idle_ms):
+    """Yield (offset_s, record), shrinking idle gaps longer than max_idle_ms"""
+    first = previous = None
+    skipped = 0
+    for record in records:
+        if first is None:
+            first = previous = record.ts_ms
+        gap = record.ts_ms - previous
+        if max_idle_ms and gap > max_idle_ms:
+            skipped += gap - max_idle_ms
+        previous = record.ts_ms
+        yield (record.ts_ms - first - skipped) / 1000, record
+
+
+def summarize(args):
+    """Analyse a recording offline"""
+    report = Report(args.window)
+    queue = WindowQueue(report, args.window)
+    report.header()
+    for offset_s, record in collapse_idle(iter_records(args.logs), args.skip_idle * 1000):
+        window = queue.get(offset_s)
+        window.add(record.latency_us / 1000, {
+            'db': record.db_us / 1000,
+            'hash': record.hash_us / 1000,
+            'render': record.render_us / 1000,
+        }, error=record.status >= 500)
+        queue.flush(window.index)
+    queue.flush()
+    report.footer()
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Measure each recorded request alone, not the page it redirects to
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def parse_server_timing(header):
+    phases = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.startswith('dur='):
+            phases[name] = float(params[4:])
+    return phases
+
+
+class Replayer:
+    """Sends recorded requests as the students who made them"""
+
+    def __init__(self, base_url, password, roster, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.password = password
+        self.roster = roster
+        self.timeout = timeout
+        self.openers = {}
+        self.logged_in = set()
+        self.login_failed = set()
+        self.lock = threading.Lock()
+        self.skipped = 0
+        self.unauthenticated = 0
+
+    def opener(self, student_id):
+        with self.lock:
+            opener = self.openers.get(student_id)
+            if opener is None:
+                jar = http.cookiejar.CookieJar()
+                opener = self.openers[student_id] = urllib.request.build_opener(
+                    urllib.request.HTTPCookieProcessor(jar), NoRedirect())
+            return opener
+
+    def send(self, student_id, method, path, form=None):
+        """Send one request; (status, latency_ms, phases, redirect location)"""
+        data = urllib.parse.urlencode(form).encode() if method == 'POST' else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        started = time.perf_counter()
+        try:
+            with self.opener(student_id).open(req, timeout=self.timeout) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            status, headers = e.code, e.headers
+        latency_ms = (time.perf_counter() - started) * 1000
+        return status, latency_ms, parse_server_timing(headers.get('Server-Timing')), headers.get('Location') or ''
+
+    def request(self, student_id, method, path, form=None):
+        return self.send(student_id, method, path, form)[:3]
+
+    def login(self, student_id):
+        """Log in as the student; a failed login (wrong password, unknown roll)
+        redirects back to / instead of /terminal"""
+        form = {'roll_number': self.roster.get(student_id, f'replay-unknown-{student_id}'),
+                'password': self.password}
+        status, latency_ms, phases, location = self.send(student_id, 'POST', '/login', form)
+        if student_id < 0:
+            # Recorded without a student, i.e. a login that failed then too
+            return status, latency_ms, phases
+        with self.lock:
+            if urllib.parse.urlsplit(location).path == '/terminal':
+                self.logged_in.add(student_id)
+                self.login_failed.discard(student_id)
+            else:
+                self.login_failed.add(student_id)
+        return status, latency_ms, phases
+
+    def ensure_login(self, student_id):
+        if student_id < 0 or student_id in self.logged_in or student_id in self.login_failed:
+            return
+        self.login(student_id)
+
+    def replay(self, record):
+        """Send one record; None if it was skipped"""
+        method, _, path = record.route.partition(' ')
+        if method == 'POST' and path == '/login':
+            return self.login(record.student_id)
+        if method == 'POST' and path != '/submit_answers':
+            # e.g. /change_password: replaying it would change real credentials
+            self.skipped += 1
+            return None
+        self.ensure_login(record.student_id)
+        if record.student_id in self.login_failed:
+            # Without a session this would only time a cheap redirect to /
+            with self.lock:
+                self.unauthenticated += 1
+            return None
+        if method == 'POST':
+            return self.request(record.student_id, 'POST', path, {f'q{i}': 'replay' for i in range(1, 7)})
+        result = self.request(record.student_id, method, path)
+        if path == '/logout':
+            # Their next request logs in again rather than timing a redirect to /
+            with self.lock:
+                self.logged_in.discard(record.student_id)
+        return result
+
+
+def load_roster(db_path):
+    if not os.path.exists(db_path):
+        print(f"⚠️  {db_path} not found; replayed logins will fail")
+        return {}
+    conn = sqlite3.connect(db_path)
+    roster = dict(conn.execute('SELECT id, roll_number FROM students'))
+    conn.close()
+    return roster
+
+
+def replay(args):
+    """Feed a recording to a running instance at args.speed"""
+    replayer = Replayer(args.base_url, args.password, load_roster(args.db), args.timeout)
+    report = Report(args.window)
+    queue = WindowQueue(report, args.window)
+    inflight = threading.BoundedSemaphore(args.concurrency)
+
+    def run(record, window, lag_ms):
+        try:
+            result = replayer.replay(record)
+            if result is not None:
+                status, latency_ms, phases = result
+                with queue.lock:
+                    window.add(latency_ms, phases, error=status >= 500)
+                    window.max_lag_ms = max(window.max_lag_ms, lag_ms)
+        except Exception as e:
+            with queue.lock:
+                window.add(args.timeout * 1000, {}, error=True)
+            print(f"❌ {record.route}: {e}", file=sys.stderr)
+        finally:
+            with queue.lock:
+                window.pending -= 1
+            inflight.release()
+
+    print(f"🔁 Replaying {', '.join(args.logs)} against {args.base_url} at {args.speed:g}x")
+    report.header()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for offset_s, record in collapse_idle(iter_records(args.logs), args.skip_idle * 1000):
+            due = started + offset_s / args.speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Blocks when the target can't keep up, which keeps memory bounded
+            inflight.acquire()
+            lag_ms = max(0.0, (time.perf_counter() - due) * 1000)
+            window = queue.get(offset_s)
+            with queue.lock:
+                window.pending += 1
+            executor.submit(run, record, window, lag_ms)
+            queue.flush(window.index - 1)
+    queue.flush()
+    report.footer()
+    if replayer.skipped:
+        print(f"⏭️  Skipped {replayer.skipped} requests that would modify credentials")
+    if replayer.login_failed:
+        print(f"❌ {len(replayer.login_failed)} students could not log in with --password; "
+              f"{replayer.unauthenticated} of their requests were not replayed")
+        print("   Replay against a copy of the exam database whose passwords were reset to --password.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or summarize a CTF Lab access log")
+    parser.add_argument('logs', nargs='+', help="access log files or CTF_ACCESS_LOG directories")
+    parser.add_argument('--summary', action='store_true', help="analyse the recording offline, send nothing")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed multiplier, e.g. 1, 5, 10")
+    parser.add_argument('--base-url', default='http://127.0.0.1:5001')
+    parser.add_argument('--db', default=os.path.join('web', 'ctf_lab.db'), help="database used to map student ids to roll numbers")
+    parser.add_argument('--password', default='default123', help="password replayed logins use")
+    parser.add_argument('--concurrency', type=int, default=64, help="maximum requests in flight")
+    parser.add_argument('--window', type=int, default=10, help="report window in seconds of recorded time")
+    parser.add_argument('--skip-idle', type=int, default=60, help="collapse idle gaps longer than this many seconds (0 keeps them)")
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    if args.summary:
+        summarize(args)
+    else:
+        replay(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Session Revocation for CTF Lab
+Logs every student out at once, e.g. when an exam ends early. Works on the
+session file used with CTF_SESSION_STORE=server (CTF_SESSION_FILE, by default
+sessions.db next to the exam database); running workers notice on their next
+request. Memory-only stores are revoked by restarting the workers.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append('web')
+from db import SESSION_PATH
+from sessions import SessionStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revoke all CTF Lab server-side sessions")
+    parser.add_argument('path', nargs='?', default=SESSION_PATH,
+                        help="session file (default: $CTF_SESSION_FILE or web/sessions.db)")
+    parser.add_argument('--stats', action='store_true', help="only show how many sessions are stored")
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error("no session file given and CTF_SESSION_FILE is empty (memory-only sessions)")
+    if not os.path.exists(args.path):
+        print(f"❌ {args.path} not found")
+        sys.exit(1)
+
+    store = SessionStore(path=args.path)
+    if args.stats:
+        print(f"📊 {store.stats()['stored']} sessions stored in {args.path}")
+        return
+    revoked = store.clear()
+    print(f"🔒 Revoked {revoked} sessions; students must log in again")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,7 @@ sudo apt update
 
 # Install required packages
 echo "📦 Installing required packages..."
-sudo apt install -y python3 python3-pip python3-venv nginx git
+sudo apt install -y python3 python3-pip python3-venv nginx git curl
 
 # Set up Python virtual environment
 echo "🐍 Setting up Python environment..."
@@ -33,49 +33,17 @@ echo "🗄️ Setting up database..."
 python3 <<EOF
 import sqlite3
 import os
-from werkzeug.security import generate_password_hash
 
-# Create database
-db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ctf_lab.db')
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
+# Importing the app runs its startup phase, which creates/migrates the schema
+# and benchmarks this host to pick the password-hashing cost
+from app import BASE_DIR, DB_PATH
+from passwords import hash_password
 
-# Create students table
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS students (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        roll_number TEXT UNIQUE NOT NULL,
-        name TEXT NOT NULL,
-        password TEXT NOT NULL,
-        flag TEXT,
-        registered INTEGER DEFAULT 1,
-        login_time DATETIME,
-        time_limit DATETIME
-    )
-''')
-
-# Create submissions table
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS submissions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        student_id INTEGER,
-        roll_number TEXT,
-        name TEXT,
-        q1_answer TEXT,
-        q2_answer TEXT,
-        q3_answer TEXT,
-        q4_answer TEXT,
-        q5_answer TEXT,
-        q6_answer TEXT,
-        score INTEGER,
-        submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (student_id) REFERENCES students (id)
-    )
-''')
+conn = sqlite3.connect(DB_PATH)
+cursor = conn.cursor()
 
 # Read students from file and insert into database
-students_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'students.txt')
-default_password = generate_password_hash('default123')
+students_file = os.path.join(os.path.dirname(BASE_DIR), 'students.txt')
 
 if os.path.exists(students_file):
     with open(students_file, 'r') as f:
@@ -87,11 +55,11 @@ if os.path.exists(students_file):
                     roll_number = parts[0].strip()
                     name = parts[1].strip()
                     
-                    # Insert or update student
+                    # Insert or update student (hashed per student, so no two share a hash)
                     cursor.execute('''
                         INSERT OR REPLACE INTO students (roll_number, name, password, registered)
                         VALUES (?, ?, ?, 1)
-                    ''', (roll_number, name, default_password))
+                    ''', (roll_number, name, hash_password('default123')))
     print(f"Added students from {students_file}")
 else:
     print(f"Warning: {students_file} not found. No students added to database.")
@@ -114,7 +82,11 @@ User=www-data
 Group=www-data
 WorkingDirectory=$(pwd)
 Environment=PATH=$(pwd)/venv/bin
-ExecStart=$(pwd)/venv/bin/python app.py
+ExecStart=$(pwd)/venv/bin/gunicorn --preload -w 2 -b 127.0.0.1:5000 app:app
+# Only report started once the workers have warmed up, so nginx (started
+# after us) never forwards a student to a cold worker
+ExecStartPost=/bin/sh -c 'until curl -sf http://127.0.0.1:5000/readyz > /dev/null; do sleep 0.5; done'
+TimeoutStartSec=120
 Restart=always
 RestartSec=3
 
@@ -122,15 +94,38 @@ RestartSec=3
 WantedBy=multi-user.target
 EOF
 
+# On boot too, nginx waits for the app to report ready
+sudo mkdir -p /etc/systemd/system/nginx.service.d
+sudo tee /etc/systemd/system/nginx.service.d/ctf-lab.conf > /dev/null <<EOF
+[Unit]
+Wants=ctf-lab.service
+After=ctf-lab.service
+EOF
+
 # Configure Nginx (optional)
 echo "🌐 Configuring Nginx..."
 sudo tee /etc/nginx/sites-available/ctf-lab > /dev/null <<EOF
+upstream ctf_lab {
+    server 127.0.0.1:5000 max_fails=3 fail_timeout=5s;
+}
+
 server {
     listen 80;
     server_name _;
 
+    # Probes for monitoring; /readyz answers 503 until the app has warmed up
+    location = /healthz {
+        access_log off;
+        proxy_pass http://ctf_lab;
+    }
+
+    location = /readyz {
+        access_log off;
+        proxy_pass http://ctf_lab;
+    }
+
     location / {
-        proxy_pass http://127.0.0.1:5000;
+        proxy_pass http://ctf_lab;
         proxy_set_header Host \$host;
         proxy_set_header X-Real-IP \$remote_addr;
         proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
@@ -150,11 +145,17 @@ sudo chown -R www-data:www-data $(pwd)/
 echo "🚀 Starting services..."
 sudo systemctl daemon-reload
 sudo systemctl enable ctf-lab nginx
-sudo systemctl start ctf-lab nginx
+# Blocks until /readyz passes (see ExecStartPost), then lets traffic in
+sudo systemctl start ctf-lab
+sudo systemctl restart nginx
 
 # Test the application
 echo "🧪 Testing application..."
-sleep 3
+if curl -sf http://localhost/readyz > /dev/null; then
+    echo "✅ Application is ready"
+else
+    echo "⚠️  /readyz is not passing yet; check: sudo journalctl -u ctf-lab"
+fi
 
 echo "✅ Setup complete!"
 echo ""
@@ -3,10 +3,36 @@
 Test script for CTF Lab Simulation System
 """
 
+import json
 import sqlite3
 import os
+import sys
+import tempfile
+from contextlib import contextmanager
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# Import the app without its startup phase, which would migrate and lock
+# web/ctf_lab.db; tests call create_app() inside temp_database() instead
+os.environ.setdefault('CTF_SKIP_STARTUP', '1')
+
+@contextmanager
+def temp_database(migrate=True):
+    """Point the app's connections at a fresh (by default migrated) database in a temp dir"""
+    sys.path.append('web')
+    import db
+    
+    saved = db.DB_PATH, getattr(db._local, 'conn', None)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'ctf_lab.db')
+        db._local.conn = None
+        try:
+            if migrate:
+                db.ensure_schema()
+            yield db.get_db_connection()
+        finally:
+            db.get_db_connection().close()
+            db.DB_PATH, db._local.conn = saved
+
 def test_database():
     """Test database connectivity and schema"""
     print("🧪 Testing database...")
@@ -57,6 +83,90 @@ def test_password_hashing():
         print("❌ Password hashing failed")
         return False
 
+def test_password_rehash():
+    """Test which stored hashes get upgraded on login"""
+    print("\n🔁 Testing password rehash policy...")
+    
+    sys.path.append('web')
+    import passwords
+    
+    assert passwords.calibrate() >= passwords.MIN_ITERATIONS
+    saved = passwords._policy['iterations']
+    passwords.configure(300_000)
+    try:
+        assert not passwords.needs_rehash(passwords.hash_password("test123")), "fresh hash flagged"
+        for kept in ('pbkdf2:sha256:250000$salt$hash',    # slightly faster host's policy
+                     'pbkdf2:sha256:600000$salt$hash'):   # stronger, e.g. Werkzeug's default
+            assert not passwords.needs_rehash(kept), f"{kept} would be rehashed at a lower cost"
+        for stale in ('pbkdf2:sha256:200000$salt$hash',   # well below the policy
+                      'pbkdf2:sha256$salt$hash',          # no explicit cost
+                      'scrypt:32768:8:1$salt$hash'):      # another algorithm
+            assert passwords.needs_rehash(stale), f"{stale} not flagged"
+    finally:
+        passwords._policy['iterations'] = saved
+    print("✅ needs_rehash upgrades weak hashes and never weakens strong ones")
+
+def test_timekeeping():
+    """Test deadline arithmetic on epoch milliseconds"""
+    print("\n⏱️  Testing exam clock...")
+    
+    sys.path.append('web')
+    from timekeeping import deadline_after, is_expired, remaining_ms
+    
+    deadline = deadline_after(90, start_ms=1_000_000)
+    assert deadline == 1_000_000 + 90 * 60_000, f"deadline_after gave {deadline}"
+    assert remaining_ms(deadline, now=deadline - 1500) == 1500
+    assert remaining_ms(deadline, now=deadline + 1500) == 0, "remaining time went negative"
+    assert not is_expired(deadline, now=deadline - 1)
+    assert is_expired(deadline, now=deadline), "deadline should expire on the millisecond"
+    assert not is_expired(None), "a student without a deadline should never expire"
+    print("✅ remaining_ms and is_expired agree on the deadline")
+
+def test_schema_upgrade():
+    """Test migrating a database created by the original setup.sh"""
+    print("\n🗄️ Testing schema migrations...")
+    
+    sys.path.append('web')
+    import db
+    from timekeeping import from_iso
+    
+    with temp_database(migrate=False) as conn:
+        # The original schema (user_version 0), with a resubmitting student
+        # and a student whose legacy deadline can't be parsed
+        db._migrate_v1(conn.cursor())
+        conn.executemany("INSERT INTO students (id, roll_number, name, password, login_time, time_limit) "
+                         "VALUES (?, ?, ?, 'x', ?, ?)",
+                         [(1, '21CS001', 'Ann', '2024-05-01T09:00:00', '2024-05-01T10:30:00'),
+                          (2, '21CS002', 'Bob', '2024-05-01T09:05:00', 'garbage')])
+        conn.executemany("INSERT INTO submissions (id, student_id, roll_number, name, q1_answer, score, "
+                         "submitted_at) VALUES (?, ?, ?, ?, ?, ?, '2024-05-01 10:00:00')",
+                         [(1, 1, '21CS001', 'Ann', 'first', 2),
+                          (2, 1, '21CS001', 'Ann', 'second', 4),
+                          (3, 1, '21CS001', 'Ann', 'third', 5),
+                          (4, 2, '21CS002', 'Bob', 'only', 1)])
+        conn.commit()
+        
+        assert db.ensure_schema() == db.SCHEMA_VERSION
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        assert version == db.SCHEMA_VERSION, f"user_version is {version}"
+        
+        # submissions keeps each student's latest row, history keeps them all
+        kept = conn.execute("SELECT id, student_id, submission_token, q1_answer FROM submissions "
+                            "ORDER BY id").fetchall()
+        assert [tuple(row) for row in kept] == [(3, 1, 'legacy-3', 'third'), (4, 2, 'legacy-4', 'only')], \
+            f"kept submissions {[tuple(row) for row in kept]}"
+        history = conn.execute("SELECT student_id, submission_token, answers, score, submitted_at_ms "
+                               "FROM submission_history ORDER BY id").fetchall()
+        assert [(row[0], row[1], row[3]) for row in history] == [
+            (1, 'legacy-1', 2), (1, 'legacy-2', 4), (1, 'legacy-3', 5), (2, 'legacy-4', 1)], "history backfill"
+        assert [json.loads(row[2])['q1'] for row in history] == ['first', 'second', 'third', 'only']
+        assert history[0][4] == from_iso('2024-05-01T10:00:00+00:00'), "submitted_at not converted"
+        
+        # The unparseable deadline is left empty instead of failing the upgrade
+        deadlines = dict(conn.execute("SELECT roll_number, deadline_ms FROM students").fetchall())
+        assert deadlines == {'21CS001': from_iso('2024-05-01T10:30:00'), '21CS002': None}, deadlines
+    print(f"✅ Original schema upgraded to v{db.SCHEMA_VERSION}: latest submissions kept, history backfilled")
+
 def test_flask_app():
     """Test Flask app imports"""
     print("\n🌐 Testing Flask app...")
@@ -64,17 +174,21 @@ def test_flask_app():
     try:
         import sys
         sys.path.append('web')
-        from app import app, get_db_connection, ensure_schema
+        from app import app, create_app
+        from db import get_db_connection
         
         print("✅ Flask app imports successfully")
         
-        # Test database connection
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+        # Test startup and the database connection on a scratch database
+        with temp_database():
+            create_app()
+            cursor = get_db_connection().cursor()
             cursor.execute("SELECT 1")
             result = cursor.fetchone()
             if result:
                 print("✅ Database connection works")
+            if app.test_client().get('/').status_code == 200:
+                print("✅ Login page renders")
         
         return True
         
@@ -82,6 +196,331 @@ def test_flask_app():
         print(f"❌ Flask app test failed: {e}")
         return False
 
+def test_submission_idempotency():
+    """Test that a resubmitted form is recorded once and a new one upserts"""
+    print("\n📝 Testing submission tokens...")
+    
+    from app import app, create_app
+    import passwords
+    
+    with temp_database() as conn:
+        create_app()
+        conn.executemany("INSERT INTO students (roll_number, name, password) VALUES (?, ?, ?)",
+                         [('21CS001', 'Test Student', passwords.hash_password('test123')),
+                          ('21CS002', 'Other Student', passwords.hash_password('test123'))])
+        conn.commit()
+        
+        client = app.test_client()
+        response = client.post('/login', data={'roll_number': '21CS001', 'password': 'test123'})
+        assert response.headers['Location'].endswith('/terminal'), "login failed"
+        
+        def counts():
+            history = conn.execute("SELECT COUNT(*) FROM submission_history").fetchone()[0]
+            submissions = conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+            return history, submissions
+        
+        def answer(roll_number):
+            row = conn.execute("SELECT submission_token, q1_answer FROM submissions WHERE roll_number = ?",
+                               (roll_number,)).fetchone()
+            return row and tuple(row)
+        
+        # A double-click posts the same form (same token) twice
+        for _ in range(2):
+            response = client.post('/submit_answers', data={'submission_token': 'token-1', 'q1': 'first'})
+            assert response.headers['Location'].endswith('/results'), f"submit returned {response.status_code}"
+        assert counts() == (1, 1), f"same token twice gave (history, submissions) = {counts()}"
+        print("✅ Same token twice: 1 history row, 1 submission")
+        
+        # Back, edit and resubmit the restored form: not saved, and the student is told
+        response = client.post('/submit_answers', data={'submission_token': 'token-1', 'q1': 'edited'})
+        assert response.headers['Location'].endswith('/submit_answers'), "edited resubmit looked saved"
+        assert counts() == (1, 1) and answer('21CS001') == ('token-1', 'first')
+        assert b'NOT saved' in client.get('/submit_answers').data, "student not told the edit was lost"
+        print("✅ Edited answers on an old form: student told they weren't saved")
+        
+        # A new form is a new attempt that replaces the submission
+        client.post('/submit_answers', data={'submission_token': 'token-2', 'q1': 'second'})
+        assert counts() == (2, 1), f"new token gave (history, submissions) = {counts()}"
+        assert answer('21CS001') == ('token-2', 'second'), f"submission not upserted: {answer('21CS001')}"
+        print("✅ New token: 2 history rows, submission upserted")
+        
+        # Tokens are chosen by the client: another student's equal token still counts
+        other = app.test_client()
+        other.post('/login', data={'roll_number': '21CS002', 'password': 'test123'})
+        response = other.post('/submit_answers', data={'submission_token': 'token-2', 'q1': 'other'})
+        assert response.headers['Location'].endswith('/results'), "second student's submission rejected"
+        assert counts() == (3, 2), f"second student's token gave (history, submissions) = {counts()}"
+        assert answer('21CS002') == ('token-2', 'other') and answer('21CS001') == ('token-2', 'second')
+        print("✅ Two students with the same token: both submissions saved")
+
+def test_archive_exams():
+    """Test archiving finished sittings out of the live database"""
+    print("\n📦 Testing exam archiving...")
+    
+    import argparse
+    import io
+    from contextlib import redirect_stdout
+    import archive_exams
+    import db
+    import view_database
+    from timekeeping import now_ms
+    
+    with temp_database() as conn, tempfile.TemporaryDirectory() as archive_dir:
+        now = now_ms()
+        # Two finished sittings' students and one still writing the exam
+        for roll, deadline in (('21CS001', now - 7_200_000), ('21CS002', now - 7_000_000),
+                               ('21CS003', now + 3_600_000)):
+            conn.execute("INSERT INTO students (roll_number, name, password, login_at_ms, deadline_ms) "
+                         "VALUES (?, ?, 'x', ?, ?)", (roll, roll, deadline - 5_400_000, deadline))
+        ids = dict(conn.execute("SELECT roll_number, id FROM students").fetchall())
+        for roll, scores in (('21CS001', [4, 6]), ('21CS002', [3]), ('21CS003', [2])):
+            for attempt, score in enumerate(scores):
+                conn.execute("INSERT INTO submission_history (student_id, submission_token, score) VALUES (?, ?, ?)",
+                             (ids[roll], f'{roll}-{attempt}', score))
+            conn.execute("INSERT INTO submissions (student_id, roll_number, name, submission_token, score) "
+                         "VALUES (?, ?, ?, ?, ?)", (ids[roll], roll, roll, f'{roll}-{attempt}', score))
+        conn.commit()
+        
+        sittings = archive_exams.finished_sittings(conn, now - 15 * 60_000)
+        assert sittings == {'default': [ids['21CS001'], ids['21CS002']]}, f"finished sittings {sittings}"
+        
+        # An earlier run that crashed after writing the archive: re-archiving replaces its rows
+        args = argparse.Namespace(format='sqlite', archive_dir=archive_dir)
+        path = os.path.join(archive_dir, 'default.db')
+        archive_exams.write_sqlite(path, *archive_exams.collect(conn, 'default', sittings['default']))
+        summary, path = archive_exams.archive_sitting(conn, 'default', sittings['default'], args)
+        assert (summary['students'], summary['submissions'], summary['attempts']) == (2, 2, 3), summary
+        assert (summary['avg_score'], summary['max_score'], summary['perfect_scores']) == (4.5, 6, 1), summary
+        
+        archive = sqlite3.connect(path)
+        archived = {table: archive.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ('sittings', 'students', 'submissions', 'submission_history')}
+        student_columns = [row[1] for row in archive.execute("PRAGMA table_info(students)")]
+        archive.close()
+        assert archived == {'sittings': 1, 'students': 2, 'submissions': 2, 'submission_history': 3}, archived
+        assert 'password' not in student_columns, "passwords were archived"
+        
+        # The live database keeps only the student still sitting, plus a summary row
+        live = {table: conn.execute(f"SELECT student_id FROM {table}").fetchall()
+                for table in ('submissions', 'submission_history')}
+        assert all([tuple(row) for row in rows] == [(ids['21CS003'],)] for rows in live.values()), "live rows"
+        deadlines = dict(conn.execute("SELECT roll_number, deadline_ms FROM students").fetchall())
+        assert deadlines['21CS001'] is None and deadlines['21CS002'] is None and deadlines['21CS003'], deadlines
+        row = conn.execute("SELECT sitting_id, students, archive_path FROM exam_summaries").fetchall()
+        assert [tuple(r) for r in row] == [(summary['sitting_id'], 2, os.path.abspath(path))], "exam_summaries"
+        
+        # Running again finds nothing left to archive
+        assert archive_exams.finished_sittings(conn, now_ms() - 15 * 60_000) == {}, "re-run would archive again"
+        print(f"✅ {summary['sitting_id']}: 2 students archived, live tables trimmed, re-run is a no-op")
+        
+        output = io.StringIO()
+        with redirect_stdout(output):
+            view_database.view_database(db.DB_PATH)
+        assert summary['sitting_id'] in output.getvalue(), "view_database.py doesn't list the sitting"
+        print("✅ view_database.py lists the archived sitting")
+
+def test_access_log():
+    """Test access log rotation and reading a recording back in order"""
+    print("\n📜 Testing access log...")
+    
+    sys.path.append('web')
+    import app as web_app
+    from accesslog import AccessLog, iter_records, log_files
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        log = AccessLog(log_dir, max_bytes=1024, backups=20, flush_records=1)
+        for i in range(200):
+            log.write(1_000_000 + i, i % 7, 200, 1000 + i, 10, 0, 20, f'GET /page/{i}')
+        log.flush()
+        files = log_files([log_dir])
+        assert len(files) == 1 and len(files[0]) > 5, f"no rotation: {files}"
+        stamps = [record.ts_ms for record in iter_records([log_dir])]
+        assert stamps == [1_000_000 + i for i in range(200)], "records lost or out of order across rotations"
+        print(f"✅ 200 records through {len(files[0])} rotated files read back in order")
+        
+        # Older rotations beyond backups are dropped, the newest records kept
+        log = AccessLog(os.path.join(log_dir, 'short'), max_bytes=1024, backups=2, flush_records=1)
+        for i in range(200):
+            log.write(2_000_000 + i, 1, 200, 0, 0, 0, 0, f'GET /page/{i}')
+        log.flush()
+        stamps = [record.ts_ms for record in iter_records([log.directory])]
+        assert len(log_files([log.directory])[0]) == 3 and stamps == sorted(stamps) and stamps[-1] == 2_000_199
+    
+    # A logout is recorded as the student who logged out, so it can be replayed
+    import passwords
+    with temp_database() as conn, tempfile.TemporaryDirectory() as log_dir:
+        web_app.create_app()
+        conn.execute("INSERT INTO students (roll_number, name, password) VALUES (?, ?, ?)",
+                     ('21CS001', 'Test Student', passwords.hash_password('test123')))
+        conn.commit()
+        student_id = conn.execute("SELECT id FROM students").fetchone()[0]
+        saved, web_app.ACCESS_LOG = web_app.ACCESS_LOG, AccessLog(log_dir)
+        try:
+            client = web_app.app.test_client()
+            client.post('/login', data={'roll_number': '21CS001', 'password': 'test123'})
+            client.get('/logout')
+            web_app.ACCESS_LOG.flush()
+        finally:
+            web_app.ACCESS_LOG = saved
+        routes = {record.route: record.student_id for record in iter_records([log_dir])}
+        assert routes == {'POST /login': student_id, 'GET /logout': student_id}, routes
+    print("✅ Login and logout are both recorded with the student's id")
+
+def test_readiness_probes():
+    """Test /readyz gating on warmup, and that probes stay out of the logs"""
+    print("\n🚦 Testing readiness probes...")
+    
+    sys.path.append('web')
+    import app as web_app
+    import metrics
+    from accesslog import AccessLog, iter_records
+    
+    with temp_database(), tempfile.TemporaryDirectory() as log_dir:
+        web_app.create_app()
+        client = web_app.app.test_client()
+        saved_warm, saved_log = dict(web_app._warm), web_app.ACCESS_LOG
+        web_app.ACCESS_LOG = AccessLog(log_dir)
+        requests = metrics.timer('request').count
+        try:
+            # A worker that hasn't warmed up (e.g. just forked) is alive but not ready
+            web_app._warm['pid'] = None
+            assert client.get('/healthz').status_code == 200
+            response = client.get('/readyz')
+            assert response.status_code == 503 and response.get_json()['status'] == 'warming', response.data
+            
+            web_app.warm_worker()
+            response = client.get('/readyz')
+            assert response.status_code == 200 and response.get_json()['status'] == 'ready', response.data
+            assert response.get_json()['warmup_ms'] >= 0
+            
+            web_app.ACCESS_LOG.flush()
+            assert metrics.timer('request').count == requests, "probes were counted as requests"
+            assert not list(iter_records([log_dir])), "probes were written to the access log"
+            
+            # ...while a student-facing request is both counted and logged
+            client.get('/')
+            web_app.ACCESS_LOG.flush()
+            assert metrics.timer('request').count == requests + 1
+            assert [record.route for record in iter_records([log_dir])] == ['GET /']
+        finally:
+            web_app._warm.update(saved_warm)
+            web_app.ACCESS_LOG = saved_log
+    print("✅ /readyz is 503 until warm_worker() runs, 200 after; probes skip metrics and the access log")
+
+def test_session_store():
+    """Test the server-side session LRU and cross-worker logout"""
+    print("\n🍪 Testing session store...")
+    
+    sys.path.append('web')
+    from sessions import SessionStore
+    
+    store = SessionStore(capacity=2)
+    for i in range(3):
+        store.put(f'sid-{i}', {'student_id': i}, expires_ms=10**15)
+    assert store.get('sid-0') is None, "LRU kept more than its capacity"
+    assert store.get('sid-2') == {'student_id': 2}
+    store.put('old', {'student_id': 9}, expires_ms=1)
+    assert store.get('old') is None, "expired session returned"
+    print("✅ LRU evicts the oldest and drops expired sessions")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sessions.db')
+        worker_a, worker_b = SessionStore(path=path), SessionStore(path=path)
+        worker_a.put('alice', {'student_id': 1}, expires_ms=10**15)
+        worker_a.put('bob', {'student_id': 2}, expires_ms=10**15)
+        assert worker_a.get('alice') and worker_a.get('bob')
+        
+        # One logout in another worker evicts just that session
+        worker_b.delete('alice')
+        assert worker_a.get('alice') is None, "revoked session still served from cache"
+        reads = worker_a.misses
+        assert worker_a.get('bob') == {'student_id': 2}
+        assert worker_a.misses == reads, "a single logout flushed the whole cache"
+        
+        # Logging everyone out does flush it
+        worker_b.clear()
+        assert worker_a.get('bob') is None, "session survived clear()"
+    print("✅ Logouts reach other workers without flushing unrelated sessions")
+
+def test_exam_packs():
+    """Test exam packs compile and grade"""
+    print("\n📦 Testing exam packs...")
+    
+    sys.path.append('web')
+    from exam_packs import load_exam_index
+    
+    exams = load_exam_index()
+    assert exams, "no exam packs found"
+    for exam in exams.values():
+        flags = exam.generate_flags('21CS001')
+        print(f"✅ {exam.id}: {len(exam.questions)} questions, {len(flags)} flags")
+    
+    # The default pack is the answer key the original grader hard-coded
+    exam = exams['default']
+    flags = exam.generate_flags('21CS001')
+    correct = {
+        'q1': '21/tcp open ftp vsftpd 2.0.8 or later, 22/tcp open ssh OpenSSH 8.9p1 Ubuntu 3ubuntu0.13, '
+              '23/tcp open telnet, 80/tcp open http nginx 1.18.0',
+        'q2': flags['ftp_flag'],
+        'q3': flags['smb_flag'],
+        'q4': flags['telnet_flag'],
+        'q5': 'vsftpd 2.0.8 or later, Samba 4.15.9, telnetd',
+        'q6': 'linux',
+    }
+    assert sum(exam.grade(correct, flags)) == 6, f"correct answers scored {exam.grade(correct, flags)}"
+    
+    # Decoy flags planted on the target, and a classmate's real flags
+    classmate = exam.generate_flags('21CS002')
+    for decoys in ({'q2': 'FLAG{wrong_flag_1}', 'q3': 'FLAG{wrong_flag_1}', 'q4': 'FLAG{wrong_telnet_flag}'},
+                   {'q2': classmate['ftp_flag'], 'q3': classmate['smb_flag'], 'q4': classmate['telnet_flag']}):
+        assert sum(exam.grade(decoys, flags)) == 0, f"{decoys} scored {exam.grade(decoys, flags)}"
+    print("✅ default: correct answers score 6/6, decoy and classmates' flags score 0")
+    
+    # A student assigned a pack that isn't installed can't log in to the wrong exam
+    from app import app, create_app
+    with temp_database() as conn:
+        create_app()
+        conn.execute("INSERT INTO students (roll_number, name, password, exam_id) VALUES (?, ?, ?, ?)",
+                     ('21CS001', 'Test Student', generate_password_hash('test123'), 'retired-pack'))
+        conn.commit()
+        client = app.test_client()
+        response = client.post('/login', data={'roll_number': '21CS001', 'password': 'test123'})
+        assert not response.headers['Location'].endswith('/terminal'), "graded against the active exam instead"
+        assert b'not available' in client.get('/').data, "student not told why"
+    print("✅ Unknown exam pack: login refused instead of falling back to the active exam")
+
+def test_item_analysis():
+    """Test that column-wise grading agrees with the per-student grader"""
+    print("\n📈 Testing item analysis...")
+    
+    sys.path.append('web')
+    import analytics
+    from exam_packs import load_exam_index
+    
+    for exam in load_exam_index().values():
+        rolls = [f'21CS{i:03d}' for i in range(1, 13)]
+        submissions = []
+        for i, roll in enumerate(rolls):
+            flags = exam.generate_flags(roll)
+            answers = {}
+            for question in exam.questions:
+                if question.flag:
+                    # Right flag, a classmate's flag, a decoy or blank
+                    choices = (flags[question.flag], exam.generate_flags('21CS999')[question.flag],
+                               'FLAG{wrong_flag_1}', '')
+                else:
+                    choices = ('', 'wrong answer', roll)
+                answers[question.id] = choices[i % len(choices)]
+            submissions.append(answers)
+        
+        answer_columns = [[answers[q.id] for answers in submissions] for q in exam.questions]
+        marks = analytics.grade_columns(exam, rolls, answer_columns)
+        for roll, answers, student_marks in zip(rolls, submissions, zip(*marks)):
+            expected = exam.grade(answers, exam.generate_flags(roll))
+            assert list(student_marks) == expected, f"{exam.id} {roll}: {list(student_marks)} != {expected}"
+        right = sum(map(sum, marks))
+        print(f"✅ {exam.id}: grade_columns matches exam.grade ({right} right answers)")
+
 def test_students_file():
     """Test students.txt file"""
     print("\n📋 Testing students.txt...")
@@ -118,14 +557,30 @@ def main():
         test_students_file,
         test_database,
         test_password_hashing,
-        test_flask_app
+        test_password_rehash,
+        test_timekeeping,
+        test_exam_packs,
+        test_schema_upgrade,
+        test_flask_app,
+        test_submission_idempotency,
+        test_archive_exams,
+        test_access_log,
+        test_readiness_probes,
+        test_session_store,
+        test_item_analysis
     ]
     
     passed = 0
     total = len(tests)
     
     for test in tests:
-        if test():
+        # Tests either return a bool or assert (so pytest sees real failures)
+        try:
+            ok = test() is not False
+        except Exception as e:
+            print(f"❌ {test.__name__} failed: {e}")
+            ok = False
+        if ok:
             passed += 1
     
     print("\n" + "=" * 40)
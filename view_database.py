@@ -6,11 +6,21 @@ Instructors can use this to view student data and submissions
 
 import sqlite3
 import os
-from datetime import datetime
+import sys
 
-def view_database():
+sys.path.append('web')
+from db import DB_PATH
+from exam_packs import load_exam_index
+from timekeeping import to_iso
+
+EXAMS = load_exam_index()
+
+def get_exam(exam_id):
+    """A submission's exam pack (NULL = the active exam, CTF_EXAM), or None if not installed"""
+    return EXAMS.get(exam_id or os.environ.get('CTF_EXAM', 'default'))
+
+def view_database(db_path=DB_PATH):
     """View the contents of the CTF Lab database"""
-    db_path = "web/ctf_lab.db"
     
     if not os.path.exists(db_path):
         print(f"Database not found at {db_path}")
@@ -37,17 +47,15 @@ def view_database():
         for student in students:
             status = "Not Registered" if student['registered'] == 0 else "Pre-registered" if student['registered'] == 1 else "Fully Registered"
             print(f"ID: {student['id']}")
+            print(f"  Roll #: {student['roll_number']}")
             print(f"  Name: {student['name']}")
-            print(f"  Email: {student['email']}")
-            print(f"  Register #: {student['register_number']}")
-            print(f"  Year/Dept: {student['year_dept']}")
-            print(f"  Phone: {student['phone_number']}")
+            print(f"  Exam: {student['exam_id'] or 'active exam'}")
             print(f"  Status: {status}")
             print(f"  Flag: {student['flag']}")
-            if student['login_time']:
-                print(f"  Login Time: {student['login_time']}")
-            if student['time_limit']:
-                print(f"  Time Limit: {student['time_limit']}")
+            if student['login_at_ms']:
+                print(f"  Login Time: {to_iso(student['login_at_ms'])}")
+            if student['deadline_ms']:
+                print(f"  Deadline: {to_iso(student['deadline_ms'])}")
             print()
     
     # View submissions
@@ -60,16 +68,14 @@ def view_database():
         print("No submissions found in database")
     else:
         for submission in submissions:
+            exam = get_exam(submission['exam_id'])
+            questions = exam.questions if exam else ()
             print(f"Submission ID: {submission['id']}")
             print(f"  Student: {submission['name']} (ID: {submission['student_id']})")
-            print(f"  Score: {submission['score']}/6")
+            print(f"  Score: {submission['score']}/{len(questions) if exam else '?'}")
             print(f"  Submitted: {submission['submitted_at']}")
-            print(f"  Q1 (Services): {submission['question_1']}")
-            print(f"  Q2 (FTP Flag): {submission['question_2']}")
-            print(f"  Q3 (SMB Flag): {submission['question_3']}")
-            print(f"  Q4 (Telnet Flag): {submission['question_4']}")
-            print(f"  Q5 (Versions): {submission['question_5']}")
-            print(f"  Q6 (OS): {submission['question_6']}")
+            for question in questions:
+                print(f"  {question.id.upper()} ({question.title}): {submission[f'{question.id}_answer']}")
             print()
     
     # Summary statistics
@@ -89,19 +95,41 @@ def view_database():
         cursor.execute("SELECT AVG(score) as avg_score FROM submissions")
         avg_score = cursor.fetchone()['avg_score']
         
-        cursor.execute("SELECT COUNT(*) as perfect FROM submissions WHERE score = 6")
-        perfect_scores = cursor.fetchone()['perfect']
+        # Perfect means every question of the submission's own exam pack
+        cursor.execute("SELECT exam_id, score FROM submissions")
+        perfect_scores = 0
+        for row in cursor.fetchall():
+            exam = get_exam(row['exam_id'])
+            if exam and row['score'] == len(exam.questions):
+                perfect_scores += 1
         
         print(f"Total Students: {total_students}")
         print(f"Registered Students: {registered_students}")
         print(f"Total Submissions: {total_submissions}")
-        print(f"Average Score: {avg_score:.2f}/6")
-        print(f"Perfect Scores (6/6): {perfect_scores}")
+        print(f"Average Score: {avg_score:.2f}")
+        print(f"Perfect Scores: {perfect_scores}")
     else:
         print(f"Total Students: {total_students}")
         print(f"Registered Students: {registered_students}")
         print("No submissions yet")
     
+    # Sittings moved out by archive_exams.py
+    try:
+        cursor.execute("SELECT * FROM exam_summaries ORDER BY started_at_ms")
+        sittings = cursor.fetchall()
+    except sqlite3.OperationalError:
+        sittings = []
+    
+    if sittings:
+        print("\n🗄️  ARCHIVED SITTINGS:")
+        print("-" * 40)
+        for sitting in sittings:
+            avg = f"{sitting['avg_score']:.2f}" if sitting['avg_score'] is not None else "-"
+            print(f"{sitting['sitting_id']} ({to_iso(sitting['started_at_ms'])})")
+            print(f"  Students: {sitting['students']}, Submissions: {sitting['submissions']}, Attempts: {sitting['attempts']}")
+            print(f"  Average Score: {avg}, Perfect Scores: {sitting['perfect_scores']}")
+            print(f"  Archive: {sitting['archive_path']}")
+    
     conn.close()
 
 if __name__ == "__main__":
@@ -3,24 +3,22 @@
 Utility script to view dynamic flags for each student
 """
 
-import hashlib
 import os
+import sys
 
-def generate_flags(roll_number):
-    """Generate unique flags for a student based on their roll number"""
-    hash_base = hashlib.md5(roll_number.encode()).hexdigest()[:8]
-    
-    return {
-        'ftp_flag': f'FLAG{{ftp_{hash_base}_flag}}',
-        'smb_flag': f'FLAG{{smb_{hash_base}_flag}}',
-        'telnet_flag': f'FLAG{{telnet_{hash_base}_flag}}'
-    }
+sys.path.append('web')
+from exam_packs import load_exam_index
 
 def main():
     print("🔒 CTF Lab - Dynamic Flag Generator")
     print("=" * 50)
     print()
     
+    exam_id = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('CTF_EXAM', 'default')
+    exam = load_exam_index()[exam_id]
+    print(f"📦 Exam pack: {exam.id} ({exam.title})")
+    print()
+    
     # Read students from file
     students_file = 'students.txt'
     if not os.path.exists(students_file):
@@ -39,12 +37,11 @@ def main():
                     roll_number = parts[0].strip()
                     name = parts[1].strip()
                     
-                    flags = generate_flags(roll_number)
+                    flags = exam.generate_flags(roll_number)
                     
                     print(f"👤 {name} ({roll_number})")
-                    print(f"   FTP:    {flags['ftp_flag']}")
-                    print(f"   SMB:    {flags['smb_flag']}")
-                    print(f"   Telnet: {flags['telnet_flag']}")
+                    for key, flag in flags.items():
+                        print(f"   {key}: {flag}")
                     print()
     
     print("💡 Note: These flags are automatically generated based on roll number")
@@ -0,0 +1,138 @@
+# ctf-lab/web/accesslog.py
+"""
+Compact binary access log for the CTF Lab
+
+Enabled by pointing CTF_ACCESS_LOG at a directory. Each worker appends
+fixed-layout records to its own access-<pid>.bin (no cross-process locking
+needed) and rotates it to .1, .2, ... once it reaches max_bytes. The buffer
+is flushed every flush_ms or flush_records, so a worker killed mid-overload
+loses at most that much of its tail. Records carry the per-phase timings
+(db, hash, render) so a recording can be analysed or replayed later with
+replay_access_log.py.
+"""
+
+import glob
+import heapq
+import os
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+
+MAGIC = b'CTFLOG1\n'
+
+# ts_ms, student_id (-1 if anonymous), status, latency/db/hash/render in
+# microseconds, then a length-prefixed "METHOD /path" route
+RECORD = struct.Struct('<qiHIIIIB')
+
+Record = namedtuple('Record', ['ts_ms', 'student_id', 'status', 'latency_us',
+                               'db_us', 'hash_us', 'render_us', 'route'])
+
+
+class AccessLog:
+    """Rotating binary log writer for one worker process"""
+
+    def __init__(self, directory, max_bytes=16 * 1024 * 1024, backups=5, flush_ms=1000, flush_records=256):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_ms = flush_ms
+        self.flush_records = flush_records
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+        self.path = None
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        # Opened on first write, and again after a fork, so a preloading
+        # master never shares its file with the workers
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.path = os.path.join(self.directory, f'access-{self._pid}.bin')
+        self._file = open(self.path, 'ab', buffering=64 * 1024)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        for n in range(self.backups - 1, 0, -1):
+            older = f'{self.path}.{n}'
+            if os.path.exists(older):
+                os.replace(older, f'{self.path}.{n + 1}')
+        os.replace(self.path, f'{self.path}.1')
+        self._open()
+
+    def write(self, ts_ms, student_id, status, latency_us, db_us, hash_us, render_us, route):
+        route_bytes = route.encode('utf-8', 'replace')[:255]
+        data = RECORD.pack(ts_ms, student_id, status, latency_us, db_us, hash_us,
+                           render_us, len(route_bytes)) + route_bytes
+        with self._lock:
+            if self._file is None or self._pid != os.getpid():
+                self._open()
+            elif self._size + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._size += len(data)
+            self._unflushed += 1
+            now = time.monotonic()
+            if self._unflushed >= self.flush_records or (now - self._flushed_at) * 1000 >= self.flush_ms:
+                self._file.flush()
+                self._unflushed = 0
+                self._flushed_at = now
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.flush()
+
+
+def read_records(path):
+    """Stream the records of one log file"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path}: not a CTF Lab access log')
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            fields = RECORD.unpack(header)
+            route = f.read(fields[-1]).decode('utf-8', 'replace')
+            yield Record(*fields[:-1], route)
+
+
+def _rotation_key(path):
+    # access-1.bin.3 (oldest) ... access-1.bin.1, access-1.bin (newest)
+    match = re.search(r'\.bin\.(\d+)$', path)
+    return -int(match.group(1)) if match else 0
+
+
+def log_files(paths):
+    """Group log files per worker, oldest rotation first"""
+    workers = {}
+    for path in paths:
+        if os.path.isdir(path):
+            found = glob.glob(os.path.join(path, 'access-*.bin*'))
+        else:
+            found = [path]
+        for file in found:
+            base = re.sub(r'\.\d+$', '', file)
+            workers.setdefault(base, set()).add(file)
+    return [sorted(files, key=_rotation_key) for _, files in sorted(workers.items())]
+
+
+def iter_records(paths):
+    """Stream records from files and/or log directories in timestamp order.
+
+    Each worker's rotations are read in sequence and the workers are merged
+    lazily, so memory stays constant however long the recording is.
+    """
+    def worker_stream(files):
+        for file in files:
+            yield from read_records(file)
+    streams = [worker_stream(files) for files in log_files(paths)]
+    return heapq.merge(*streams, key=lambda record: record.ts_ms)
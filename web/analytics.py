@@ -0,0 +1,147 @@
+# ctf-lab/web/analytics.py
+"""
+Per-question item analysis for the CTF Lab
+
+For each question of an exam sitting: difficulty (share of students who got
+it right), discrimination (upper 27% minus lower 27% by total score, plus the
+point-biserial correlation with the rest of the paper) and the most common
+wrong answers, which is where decoy flags show up.
+
+Submissions are fetched in chunks and transposed into one list per column,
+then every statistic is a whole-column operation (map/zip/compress/Counter
+run the loops in C). Answer-only questions are graded once per distinct
+answer rather than once per student. Results are cached per sitting until
+new submissions arrive.
+"""
+
+import time
+from collections import Counter
+from itertools import compress, repeat
+from math import sqrt
+from operator import eq, mul, not_, sub
+
+import metrics
+from exam_packs import flag_hash
+
+CHUNK_ROWS = 10_000
+TOP_WRONG = 5
+
+# Upper/lower group size for the discrimination index (Kelley's 27%)
+GROUP_SHARE = 0.27
+
+# (database, exam_id, sitting_id) -> (fingerprint, result)
+_cache = {}
+
+
+def _source(exam, default_exam_id, sitting_id):
+    """SQL selecting (roll_number, answers...) for one sitting, and its fingerprint query"""
+    answers = ', '.join(f"COALESCE({q.id}_answer, '')" for q in exam.questions)
+    if sitting_id is None:
+        # Live database: the current sitting is whatever hasn't been archived
+        where, params = 'COALESCE(exam_id, ?) = ?', (default_exam_id, exam.id)
+        fingerprint = ('SELECT (SELECT COUNT(*) FROM submissions), '
+                       '(SELECT MAX(id) FROM submission_history)', ())
+    else:
+        # Archive database written by archive_exams.py
+        where, params = 'sitting_id = ?', (sitting_id,)
+        fingerprint = ('SELECT COUNT(*) FROM submissions WHERE sitting_id = ?', (sitting_id,))
+    return f'SELECT roll_number, {answers} FROM submissions WHERE {where}', params, fingerprint
+
+
+def load_columns(conn, sql, params, width):
+    """Run sql and return its result as width lists, one per column"""
+    columns = [[] for _ in range(width)]
+    cursor = conn.cursor()
+    cursor.row_factory = None  # plain tuples transpose fastest
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(CHUNK_ROWS)
+        if not rows:
+            return columns
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+
+
+def grade_columns(exam, rolls, answer_columns):
+    """One list of bools per question, graded a column at a time"""
+    hashes = None
+    marks = []
+    for question, answers in zip(exam.questions, answer_columns):
+        if question.flag:
+            # Each student has their own flag: compare against the expected column
+            if hashes is None:
+                hashes = list(map(flag_hash, rolls))
+            template = exam.flag_templates[question.flag]
+            expected = map(template.replace, repeat('{hash}'), hashes)
+            marks.append(list(map(eq, answers, expected)))
+        else:
+            verdicts = {answer: question.match(answer, {}) for answer in set(answers)}
+            marks.append(list(map(verdicts.__getitem__, answers)))
+    return marks
+
+
+def item_stats(question, answers, marks, totals, lower, upper):
+    n = len(marks)
+    right = sum(marks)
+    p = right / n
+    k = len(upper)
+    discrimination = (sum(map(marks.__getitem__, upper)) - sum(map(marks.__getitem__, lower))) / k
+
+    # Point-biserial against the rest of the paper, so the item doesn't
+    # correlate with itself
+    point_biserial = None
+    if 0 < right < n:
+        rest = list(map(sub, totals, marks))
+        rest_sum = sum(rest)
+        mean = rest_sum / n
+        sd = sqrt(max(0.0, sum(map(mul, rest, rest)) / n - mean * mean))
+        if sd:
+            right_sum = sum(compress(rest, marks))
+            mean_right = right_sum / right
+            mean_wrong = (rest_sum - right_sum) / (n - right)
+            point_biserial = round((mean_right - mean_wrong) / sd * sqrt(p * (1 - p)), 3)
+
+    wrong = Counter(compress(answers, map(not_, marks)))
+    blank = wrong.pop('', 0)
+    return {
+        'id': question.id,
+        'title': question.title,
+        'difficulty': round(p, 3),
+        'discrimination': round(discrimination, 3),
+        'point_biserial': point_biserial,
+        'blank': blank,
+        'wrong_answers': wrong.most_common(TOP_WRONG),
+    }
+
+
+def analyze(conn, exam, default_exam_id=None, sitting_id=None, database=None):
+    """Item analysis of one sitting of exam, cached until its submissions change.
+
+    Without sitting_id conn is the live database; with it, an archive
+    database from archive_exams.py. database names conn in the cache key.
+    """
+    sql, params, (fingerprint_sql, fingerprint_params) = _source(exam, default_exam_id or exam.id, sitting_id)
+    key = (database, exam.id, sitting_id)
+    fingerprint = tuple(conn.execute(fingerprint_sql, fingerprint_params).fetchone())
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    started = time.perf_counter()
+    rolls, *answer_columns = load_columns(conn, sql, params, 1 + len(exam.questions))
+    result = {'exam_id': exam.id, 'sitting_id': sitting_id, 'submissions': len(rolls), 'questions': []}
+    if rolls:
+        marks = grade_columns(exam, rolls, answer_columns)
+        totals = list(map(sum, zip(*marks)))
+        order = sorted(range(len(rolls)), key=totals.__getitem__)
+        k = max(1, round(len(rolls) * GROUP_SHARE))
+        lower, upper = order[:k], order[-k:]
+        result['average_score'] = round(sum(totals) / len(totals), 3)
+        result['questions'] = [item_stats(question, answers, question_marks, totals, lower, upper)
+                               for question, answers, question_marks in zip(exam.questions, answer_columns, marks)]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    metrics.timer('item_analysis').observe(elapsed_ms)
+    result['elapsed_ms'] = round(elapsed_ms, 1)
+
+    _cache[key] = (fingerprint, result)
+    return result
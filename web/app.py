@@ -1,70 +1,178 @@
 # ctf-lab/web/app.py
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, g
+from flask import before_render_template, template_rendered
+import atexit
+import json
+import secrets
 import sqlite3
 import os
 from functools import wraps
-from datetime import datetime, timedelta
 import time
 
+import analytics
+import metrics
+import passwords
+from accesslog import AccessLog
+from db import (BASE_DIR, DB_PATH, SESSION_PATH, SQL_INSERT_HISTORY, SQL_SET_LOGIN,
+                ensure_schema_locked, get_db_connection)
+from exam_packs import ANSWER_COLUMNS, ExamPackError, load_exam_index
+from sessions import ServerSessionInterface, SessionStore, regenerate
+from timekeeping import deadline_after, is_expired, now_ms, remaining_ms
+
 app = Flask(__name__, static_url_path='', static_folder='static')
 app.secret_key = os.environ.get('FLASK_SECRET', 'dev-secret-change-me')
+app.config['EXAM_ID'] = os.environ.get('CTF_EXAM', 'default')
+app.config['SERVER_TIMING'] = os.environ.get('CTF_SERVER_TIMING') == '1'
 
-def get_db_connection():
-    db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ctf_lab.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 
-def generate_flags(roll_number):
-    """Generate unique flags for a student based on their roll number"""
-    import hashlib
-    hash_base = hashlib.md5(roll_number.encode()).hexdigest()[:8]
-    
-    return {
-        'ftp_flag': f'FLAG{{ftp_{hash_base}_flag}}',
-        'smb_flag': f'FLAG{{smb_{hash_base}_flag}}',
-        'telnet_flag': f'FLAG{{telnet_{hash_base}_flag}}'
-    }
+# Load balancer probes: answered without timing, logging or sessions
+PROBE_PATHS = frozenset(['/healthz', '/readyz'])
+
+# SQL on the request path. Kept as constants so every connection's statement
+# cache compiles each one once and reuses it for the life of the worker.
+SQL_STUDENT_BY_ROLL = 'SELECT * FROM students WHERE roll_number = ?'
+SQL_ROSTER = 'SELECT roll_number, exam_id FROM students'
+SQL_DEADLINE = 'SELECT deadline_ms FROM students WHERE id = ?'
+SQL_SET_PASSWORD = 'UPDATE students SET password = ?, registered = 2 WHERE roll_number = ?'
+SQL_REHASH_PASSWORD = 'UPDATE students SET password = ? WHERE id = ?'
+SQL_UPSERT_SUBMISSION = '''
+    INSERT INTO submissions
+    (student_id, roll_number, name, exam_id, submission_token,
+     q1_answer, q2_answer, q3_answer, q4_answer, q5_answer, q6_answer, score, submitted_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (student_id) DO UPDATE SET
+        roll_number = excluded.roll_number, name = excluded.name, exam_id = excluded.exam_id,
+        submission_token = excluded.submission_token,
+        q1_answer = excluded.q1_answer, q2_answer = excluded.q2_answer, q3_answer = excluded.q3_answer,
+        q4_answer = excluded.q4_answer, q5_answer = excluded.q5_answer, q6_answer = excluded.q6_answer,
+        score = excluded.score, submitted_at = excluded.submitted_at
+'''
+SQL_STUDENT_SUBMISSION = 'SELECT * FROM submissions WHERE student_id = ?'
+SQL_HISTORY_ANSWERS = 'SELECT answers FROM submission_history WHERE student_id = ? AND submission_token = ?'
+
+# exam_id -> compiled ExamPack, loaded once at startup (see exam_packs.py)
+EXAMS = {}
+
+# (exam_id, roll_number) -> flags, filled for the whole roster at startup
+FLAG_INDEX = {}
+
+# Binary access log, enabled with CTF_ACCESS_LOG=<directory>; size the
+# rotation to hold a whole exam day (about 50 bytes per request)
+ACCESS_LOG = None
+if os.environ.get('CTF_ACCESS_LOG'):
+    ACCESS_LOG = AccessLog(os.environ['CTF_ACCESS_LOG'],
+                           max_bytes=int(os.environ.get('CTF_ACCESS_LOG_MAX_MB', 16)) * 1024 * 1024,
+                           backups=int(os.environ.get('CTF_ACCESS_LOG_BACKUPS', 5)))
+
+# Server-side sessions, enabled with CTF_SESSION_STORE=server (see sessions.py)
+SESSION_STORE = None
+if os.environ.get('CTF_SESSION_STORE') == 'server':
+    SESSION_STORE = SessionStore(capacity=int(os.environ.get('CTF_SESSION_CAPACITY', 4096)),
+                                 path=SESSION_PATH or None)
+    app.session_interface = ServerSessionInterface(
+        SESSION_STORE, grace_ms=int(os.environ.get('CTF_SESSION_GRACE_MINUTES', 15)) * 60_000)
+
+# Set by warm_worker() in the process that finished warming up
+_warm = {'pid': None, 'ms': None}
+
+def get_exam(exam_id=None):
+    """Return a compiled exam pack; no exam_id means the active exam.
+
+    An exam_id naming a pack that isn't installed raises ExamPackError rather
+    than quietly grading the student against another exam.
+    """
+    if not exam_id:
+        return EXAMS[app.config['EXAM_ID']]
+    exam = EXAMS.get(exam_id)
+    if exam is None:
+        raise ExamPackError(f"Exam pack '{exam_id}' not found (have: {', '.join(EXAMS)})")
+    return exam
+
+def get_flags(exam, roll_number):
+    """Look up a student's flags in the index, generating them on a miss"""
+    key = (exam.id, roll_number)
+    flags = FLAG_INDEX.get(key)
+    if flags is None:
+        flags = FLAG_INDEX[key] = exam.generate_flags(roll_number)
+    return flags
+
+def build_flag_index(conn):
+    cursor = conn.cursor()
+    cursor.execute(SQL_ROSTER)
+    index = {}
+    for row in cursor.fetchall():
+        try:
+            exam = get_exam(row['exam_id'])
+        except ExamPackError as e:
+            # Their login is refused until the pack is installed
+            print(f"⚠️  Student {row['roll_number']}: {e}", flush=True)
+            continue
+        index[(exam.id, row['roll_number'])] = exam.generate_flags(row['roll_number'])
+    return index
 
-def ensure_schema():
+def warm_templates():
+    """Compile every template and render the exam pages once per exam"""
+    for name in sorted(os.listdir(TEMPLATE_DIR)):
+        if name.endswith('.html'):
+            app.jinja_env.get_template(name)
+    with app.test_request_context():
+        for exam in EXAMS.values():
+            render_template('terminal.html', exam=exam, flags=exam.generate_flags('warmup'))
+            render_template('submit.html', exam=exam, submission_token='warmup')
+    return len(app.jinja_env.cache)
+
+def warm_worker():
+    """Per-process warmup, run again in every forked worker.
+
+    Opens this worker's connection, compiles the request-path statements into
+    its cache and reads the roster and deadlines into its page cache, so the
+    first logins don't pay for any of it. /readyz reports ready afterwards.
+    """
+    started = time.perf_counter()
+    conn = get_db_connection()
+    conn.execute(SQL_STUDENT_BY_ROLL, ('',)).fetchall()
+    conn.execute(SQL_DEADLINE, (0,)).fetchall()
+    conn.execute(SQL_STUDENT_SUBMISSION, (0,)).fetchall()
+    conn.execute('SELECT id, roll_number, password, exam_id, deadline_ms FROM students').fetchall()
+    warmup_ms = (time.perf_counter() - started) * 1000
+    _warm.update(pid=os.getpid(), ms=warmup_ms)
+    metrics.set_gauge('warmup_ms', round(warmup_ms, 1))
+    return warmup_ms
+
+def create_app():
+    """Run the one-time startup phase and return the configured app.
+
+    Startup migrates/verifies the schema, compiles the exam packs, indexes
+    flags for the whole roster, picks the password-hashing cost and warms
+    the templates, hashing and this process's connection, so requests never
+    pay for any of it.
+    """
+    if app.config.get('STARTUP_MS') is not None:
+        return app
+    started = time.perf_counter()
+    
+    schema_version = ensure_schema_locked()
+    EXAMS.update(load_exam_index())
+    if app.config['EXAM_ID'] not in EXAMS:
+        raise RuntimeError(f"Exam pack '{app.config['EXAM_ID']}' not found (have: {', '.join(EXAMS)})")
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Create students table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                roll_number TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                password TEXT NOT NULL,
-                flag TEXT,
-                registered INTEGER DEFAULT 1,
-                login_time DATETIME,
-                time_limit DATETIME
-            )
-        ''')
-        
-        # Create submissions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id INTEGER,
-                roll_number TEXT,
-                name TEXT,
-                q1_answer TEXT,
-                q2_answer TEXT,
-                q3_answer TEXT,
-                q4_answer TEXT,
-                q5_answer TEXT,
-                q6_answer TEXT,
-                score INTEGER,
-                submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (student_id) REFERENCES students (id)
-            )
-        ''')
-        
-        conn.commit()
+        FLAG_INDEX.update(build_flag_index(conn))
+    hash_iterations = passwords.configure()
+    passwords.verify_password(passwords.hash_password('warmup'), 'warmup')
+    templates = warm_templates()
+    warm_worker()
+    if SESSION_STORE is not None:
+        # Drop persisted sessions whose exam ended while we were down
+        SESSION_STORE.sweep()
+    
+    startup_ms = (time.perf_counter() - started) * 1000
+    app.config['STARTUP_MS'] = startup_ms
+    metrics.set_gauge('startup_ms', round(startup_ms, 1))
+    print(f"🚀 CTF Lab worker {os.getpid()} ready in {startup_ms:.1f} ms "
+          f"(schema v{schema_version}, {len(EXAMS)} exams, {len(FLAG_INDEX)} students indexed, "
+          f"pbkdf2 {hash_iterations} iterations, {templates} templates compiled)", flush=True)
+    return app
 
 def login_required(f):
     @wraps(f)
@@ -74,21 +182,69 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def session_deadline():
+    """The logged-in student's deadline in epoch ms, cached in the session.
+
+    Sessions from before the move to epoch deadlines only carry the student
+    id, so those fall back to the students table once.
+    """
+    deadline = session.get('deadline')
+    if deadline is None and 'student_id' in session:
+        with get_db_connection() as conn:
+            row = conn.execute(SQL_DEADLINE, (session['student_id'],)).fetchone()
+        if row and row['deadline_ms'] is not None:
+            deadline = session['deadline'] = row['deadline_ms']
+    return deadline
+
 def check_time_limit(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'student_id' in session:
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT time_limit FROM students WHERE id = ?', (session['student_id'],))
-                result = cursor.fetchone()
-                if result and result['time_limit']:
-                    time_limit = datetime.fromisoformat(result['time_limit'])
-                    if datetime.now() > time_limit:
-                        return redirect(url_for('time_expired'))
+        if 'student_id' in session and is_expired(session_deadline()):
+            return redirect(url_for('time_expired'))
         return f(*args, **kwargs)
     return decorated_function
 
+@app.before_request
+def start_request_timer():
+    if request.path not in PROBE_PATHS:
+        g.request_started = time.perf_counter()
+        # Who sent it, for requests that end logged out (/logout)
+        g.student_id = session.get('student_id', -1)
+
+def _render_started(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+def _render_finished(sender, template, context, **extra):
+    started = g.pop('render_started', None)
+    if started is not None:
+        metrics.add_phase('render', (time.perf_counter() - started) * 1000)
+
+before_render_template.connect(_render_started, app)
+template_rendered.connect(_render_finished, app)
+
+@app.after_request
+def record_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    phases = g.get('phases', {})
+    metrics.timer('request').observe(elapsed_ms)
+    
+    if app.config['SERVER_TIMING']:
+        timings = [f'{name};dur={ms:.2f}' for name, ms in phases.items()]
+        timings.append(f'total;dur={elapsed_ms:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+    
+    if ACCESS_LOG is not None:
+        ACCESS_LOG.write(
+            now_ms() - int(elapsed_ms), session.get('student_id', g.student_id), response.status_code,
+            int(elapsed_ms * 1000), int(phases.get('db', 0) * 1000),
+            int(phases.get('hash', 0) * 1000), int(phases.get('render', 0) * 1000),
+            f'{request.method} {request.path}'
+        )
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -104,27 +260,36 @@ def login():
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM students WHERE roll_number = ?', (roll_number,))
+        cursor.execute(SQL_STUDENT_BY_ROLL, (roll_number,))
         student = cursor.fetchone()
         
-        if student and check_password_hash(student['password'], password):
+        if student and passwords.verify_password(student['password'], password):
+            # Bring the stored hash in line with this host's hashing policy
+            if passwords.needs_rehash(student['password']):
+                cursor.execute(SQL_REHASH_PASSWORD, (passwords.hash_password(password), student['id']))
+            
+            try:
+                exam = get_exam(student['exam_id'])
+            except ExamPackError as e:
+                print(f"⚠️  Student {student['roll_number']}: {e}", flush=True)
+                flash('Your exam is not available on this server. Please ask the invigilator.')
+                return redirect(url_for('index'))
+            
+            # A fresh session id for every login (server-side sessions)
+            regenerate(session)
             session['student_id'] = student['id']
             session['roll_number'] = student['roll_number']
             session['name'] = student['name']
+            session['exam_id'] = exam.id
             
-            # Set login time and time limit (30 minutes)
-            login_time = datetime.now()
-            time_limit = login_time + timedelta(minutes=30)
+            # Set login time and the exam's deadline (epoch ms)
+            login_at = now_ms()
+            deadline = deadline_after(exam.time_limit_minutes, login_at)
             
-            cursor.execute('''
-                UPDATE students 
-                SET login_time = ?, time_limit = ? 
-                WHERE id = ?
-            ''', (login_time.isoformat(), time_limit.isoformat(), student['id']))
+            cursor.execute(SQL_SET_LOGIN, (login_at, deadline, student['id']))
             conn.commit()
             
-            session['login_time'] = login_time.isoformat()
-            session['time_limit'] = time_limit.isoformat()
+            session['deadline'] = deadline
             
             return redirect(url_for('terminal'))
         else:
@@ -148,16 +313,12 @@ def change_password():
         
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM students WHERE roll_number = ?', (roll_number,))
+            cursor.execute(SQL_STUDENT_BY_ROLL, (roll_number,))
             student = cursor.fetchone()
             
             if student:
-                hashed_password = generate_password_hash(new_password)
-                cursor.execute('''
-                    UPDATE students 
-                    SET password = ?, registered = 2 
-                    WHERE roll_number = ?
-                ''', (hashed_password, roll_number))
+                hashed_password = passwords.hash_password(new_password)
+                cursor.execute(SQL_SET_PASSWORD, (hashed_password, roll_number))
                 conn.commit()
                 flash('Password changed successfully! You can now login.')
                 return redirect(url_for('index'))
@@ -172,89 +333,66 @@ def change_password():
 @check_time_limit
 def terminal():
     # Generate dynamic flags based on student's roll number
-    roll_number = session.get('roll_number', '')
-    flags = generate_flags(roll_number)
+    exam = get_exam(session.get('exam_id'))
+    flags = get_flags(exam, session.get('roll_number', ''))
     
-    return render_template('terminal.html', flags=flags)
+    return render_template('terminal.html', exam=exam, flags=flags)
 
 @app.route('/submit_answers', methods=['GET', 'POST'])
 @login_required
 @check_time_limit
 def submit_answers():
+    exam = get_exam(session.get('exam_id'))
     if request.method == 'POST':
         # Get answers from form
-        q1_answer = request.form.get('q1', '').strip()
-        q2_answer = request.form.get('q2', '').strip()
-        q3_answer = request.form.get('q3', '').strip()
-        q4_answer = request.form.get('q4', '').strip()
-        q5_answer = request.form.get('q5', '').strip()
-        q6_answer = request.form.get('q6', '').strip()
+        answers = {q.id: request.form.get(q.id, '').strip() for q in exam.questions}
         
-        # Generate dynamic correct answers based on student's roll number
-        roll_number = session.get('roll_number', '')
-        flags = generate_flags(roll_number)
+        # Grade with the pack's compiled matchers and the student's indexed flags
+        flags = get_flags(exam, session.get('roll_number', ''))
+        score = sum(exam.grade(answers, flags))
         
-        correct_answers = {
-            'q1': '21/tcp open ftp vsftpd 2.0.8 or later, 22/tcp open ssh OpenSSH 8.9p1 Ubuntu 3ubuntu0.13, 23/tcp open telnet, 80/tcp open http nginx 1.18.0',
-            'q2': flags['ftp_flag'],
-            'q3': flags['smb_flag'],
-            'q4': flags['telnet_flag'],
-            'q5': 'vsftpd 2.0.8 or later, Samba 4.15.9, telnetd',
-            'q6': 'Linux'
-        }
-        
-        # Calculate score
-        score = 0
-        for q_num, correct_answer in correct_answers.items():
-            if q_num == 'q1':
-                # For Q1, check if all required services are mentioned
-                student_answer = q1_answer.lower()
-                required_services = ['ftp', 'ssh', 'telnet', 'http']
-                if all(service in student_answer for service in required_services):
-                    score += 1
-            elif q_num == 'q2' and q2_answer == correct_answer:
-                score += 1
-            elif q_num == 'q3' and q3_answer == correct_answer:
-                score += 1
-            elif q_num == 'q4' and q4_answer == correct_answer:
-                score += 1
-            elif q_num == 'q5' and q5_answer == correct_answer:
-                score += 1
-            elif q_num == 'q6' and q6_answer.lower() == correct_answer.lower():
-                score += 1
-        
-        # Save submission to database
+        # The token comes from the rendered form, so double-clicks and browser
+        # retries of the same form are recorded once
+        token = request.form.get('submission_token') or secrets.token_urlsafe(16)
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO submissions 
-                (student_id, roll_number, name, q1_answer, q2_answer, q3_answer, q4_answer, q5_answer, q6_answer, score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                session['student_id'], session['roll_number'], session['name'],
-                q1_answer, q2_answer, q3_answer, q4_answer, q5_answer, q6_answer, score
+            cursor.execute(SQL_INSERT_HISTORY, (
+                session['student_id'], token, exam.id, json.dumps(answers), score, now_ms()
             ))
+            if cursor.rowcount:
+                cursor.execute(SQL_UPSERT_SUBMISSION, (
+                    session['student_id'], session['roll_number'], session['name'], exam.id, token,
+                    *(answers.get(column) for column in ANSWER_COLUMNS), score
+                ))
+            else:
+                # This form was already submitted. A retry is fine, but answers
+                # edited after going Back must not look saved when they weren't
+                cursor.execute(SQL_HISTORY_ANSWERS, (session['student_id'], token))
+                previous = cursor.fetchone()
+                if previous is not None and json.loads(previous['answers']) != answers:
+                    flash('This answer sheet was already submitted, so your changed answers were NOT saved. '
+                          'Please enter them again on this form and submit.')
+                    return redirect(url_for('submit_answers'))
             conn.commit()
         
         return redirect(url_for('results'))
     
-    return render_template('submit.html')
+    return render_template('submit.html', exam=exam, submission_token=secrets.token_urlsafe(16))
 
 @app.route('/results')
 @login_required
 def results():
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM submissions 
-            WHERE student_id = ? 
-            ORDER BY submitted_at DESC 
-            LIMIT 1
-        ''', (session['student_id'],))
+        cursor.execute(SQL_STUDENT_SUBMISSION, (session['student_id'],))
         submission = cursor.fetchone()
         
         if submission:
-            return render_template('results.html', submission=submission)
+            exam = get_exam(submission['exam_id'])
+            answers = {column: submission[f'{column}_answer'] for column in ANSWER_COLUMNS}
+            marks = exam.grade(answers, get_flags(exam, submission['roll_number']))
+            graded = [(q, answers[q.id], correct) for q, correct in zip(exam.questions, marks)]
+            return render_template('results.html', submission=submission, exam=exam, graded=graded)
         else:
             return redirect(url_for('submit_answers'))
 
@@ -267,20 +405,74 @@ def logout():
     session.clear()
     return redirect(url_for('index'))
 
+@app.route('/api/metrics')
+def metrics_snapshot():
+    # Optional shared secret so the numbers aren't public on exam day
+    token = os.environ.get('CTF_METRICS_TOKEN')
+    if token and request.args.get('token') != token:
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(metrics.snapshot())
+
+@app.route('/api/analytics/<exam_id>')
+def item_analysis(exam_id):
+    # Item analysis reveals which answers are wrong, so unlike /api/metrics
+    # it is never served without the shared secret
+    token = os.environ.get('CTF_METRICS_TOKEN')
+    if not token or request.args.get('token') != token:
+        return jsonify({'error': 'forbidden'}), 403
+    if exam_id not in EXAMS:
+        return jsonify({'error': 'unknown exam'}), 404
+    with get_db_connection() as conn:
+        return jsonify(analytics.analyze(conn, EXAMS[exam_id], app.config['EXAM_ID'], database=DB_PATH))
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is up and answering
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: this worker has warmed up and can reach the database
+    if _warm['pid'] != os.getpid():
+        return jsonify({'status': 'warming', 'pid': os.getpid()}), 503
+    try:
+        get_db_connection().execute('SELECT 1').fetchone()
+    except sqlite3.Error as e:
+        return jsonify({'status': 'database unavailable', 'pid': os.getpid(), 'error': str(e)}), 503
+    return jsonify({
+        'status': 'ready',
+        'pid': os.getpid(),
+        'startup_ms': round(app.config['STARTUP_MS'], 1),
+        'warmup_ms': round(_warm['ms'], 1)
+    })
+
 @app.route('/api/time_remaining')
 @login_required
 def time_remaining():
-    if 'time_limit' in session:
-        time_limit = datetime.fromisoformat(session['time_limit'])
-        remaining = time_limit - datetime.now()
-        if remaining.total_seconds() <= 0:
-            return jsonify({'expired': True})
-        return jsonify({
-            'expired': False,
-            'remaining_seconds': int(remaining.total_seconds())
-        })
-    return jsonify({'expired': True})
+    deadline = session_deadline()
+    if deadline is None:
+        return jsonify({'expired': True})
+    remaining = remaining_ms(deadline)
+    if remaining <= 0:
+        return jsonify({'expired': True})
+    return jsonify({
+        'expired': False,
+        'remaining_seconds': remaining // 1000,
+        'deadline_ms': deadline
+    })
+
+# Every importer (gunicorn worker, setup script) gets a started app; tests
+# set CTF_SKIP_STARTUP=1 and call create_app() once their database is ready
+if os.environ.get('CTF_SKIP_STARTUP') != '1':
+    create_app()
+
+# With gunicorn --preload the startup above runs once in the master; each
+# forked worker still needs its own connection warmed before it serves
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=warm_worker)
+
+if ACCESS_LOG is not None:
+    atexit.register(ACCESS_LOG.flush)
 
 if __name__ == '__main__':
-    ensure_schema()
     app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -0,0 +1,267 @@
+# ctf-lab/web/db.py
+"""
+Database access and schema migrations for the CTF Lab
+
+Shared by the web app and the instructor scripts, so a script can open the
+exam database (and bring its schema up to date) without running the web
+app's startup.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from exam_packs import ANSWER_COLUMNS
+from timekeeping import from_iso
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: single process, nothing to coordinate
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get('CTF_DB_PATH', os.path.join(BASE_DIR, 'ctf_lab.db'))
+
+# Server-side session file, shared by all workers; CTF_SESSION_FILE= (empty)
+# keeps sessions in memory, which only works with a single worker
+SESSION_PATH = os.environ.get('CTF_SESSION_FILE', os.path.join(os.path.dirname(DB_PATH), 'sessions.db'))
+
+# Statements the migrations share with the request path
+SQL_SET_LOGIN = 'UPDATE students SET login_at_ms = ?, deadline_ms = ? WHERE id = ?'
+SQL_INSERT_HISTORY = '''
+    INSERT OR IGNORE INTO submission_history
+    (student_id, submission_token, exam_id, answers, score, submitted_at_ms)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+_local = threading.local()
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that charges statement time (including lock waits) to the request's db phase"""
+    
+    def execute(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            metrics.add_phase('db', (time.perf_counter() - started) * 1000)
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+    
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            metrics.add_phase('db', (time.perf_counter() - started) * 1000)
+
+def get_db_connection():
+    """Return this thread's connection, opening it on first use.
+
+    Connections are reused across requests so the statement cache survives;
+    the pid check makes a forked worker open its own instead of sharing the
+    parent's handle.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(DB_PATH, factory=TimedConnection)
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+def _migrate_v1(cursor):
+    # Create students table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            roll_number TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            password TEXT NOT NULL,
+            flag TEXT,
+            registered INTEGER DEFAULT 1,
+            login_time DATETIME,
+            time_limit DATETIME
+        )
+    ''')
+    
+    # Create submissions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            roll_number TEXT,
+            name TEXT,
+            q1_answer TEXT,
+            q2_answer TEXT,
+            q3_answer TEXT,
+            q4_answer TEXT,
+            q5_answer TEXT,
+            q6_answer TEXT,
+            score INTEGER,
+            submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+
+def _migrate_v2(cursor):
+    # Exam pack each student sits (NULL = the active exam) and each submission was graded against
+    cursor.execute('ALTER TABLE students ADD COLUMN exam_id TEXT')
+    cursor.execute('ALTER TABLE submissions ADD COLUMN exam_id TEXT')
+
+def _migrate_v3(cursor):
+    # Integer epoch-millisecond login/deadline, replacing the naive-local ISO columns
+    cursor.execute('ALTER TABLE students ADD COLUMN login_at_ms INTEGER')
+    cursor.execute('ALTER TABLE students ADD COLUMN deadline_ms INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_students_deadline_ms ON students (deadline_ms)')
+    cursor.execute('SELECT id, roll_number, login_time, time_limit FROM students WHERE time_limit IS NOT NULL')
+    for row in cursor.fetchall():
+        login_at = _legacy_ms(row, 'login_time')
+        deadline = _legacy_ms(row, 'time_limit')
+        cursor.execute(SQL_SET_LOGIN, (login_at, deadline, row['id']))
+
+def _legacy_ms(row, column):
+    # A malformed legacy value is left NULL rather than failing the migration
+    value = row[column]
+    if not value:
+        return None
+    try:
+        return from_iso(value)
+    except (TypeError, ValueError):
+        print(f"⚠️  Student {row['roll_number']}: unparseable {column} {value!r}, left empty", flush=True)
+        return None
+
+def _migrate_v4(cursor):
+    # Every submission attempt, keyed by the token its form was rendered with
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS submission_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            submission_token TEXT NOT NULL UNIQUE,
+            exam_id TEXT,
+            answers TEXT,
+            score INTEGER,
+            submitted_at_ms INTEGER,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    cursor.execute('''
+        SELECT id, student_id, exam_id, q1_answer, q2_answer, q3_answer, q4_answer, q5_answer, q6_answer,
+               score, CAST(strftime('%s', submitted_at) AS INTEGER) * 1000 AS submitted_at_ms
+        FROM submissions
+    ''')
+    for row in cursor.fetchall():
+        answers = {column: row[f'{column}_answer'] for column in ANSWER_COLUMNS}
+        cursor.execute(SQL_INSERT_HISTORY, (row['student_id'], f"legacy-{row['id']}", row['exam_id'],
+                                            json.dumps(answers), row['score'], row['submitted_at_ms']))
+    
+    # submissions keeps only each student's latest answers from now on
+    cursor.execute('ALTER TABLE submissions ADD COLUMN submission_token TEXT')
+    cursor.execute('DELETE FROM submissions WHERE id NOT IN (SELECT MAX(id) FROM submissions GROUP BY student_id)')
+    cursor.execute("UPDATE submissions SET submission_token = 'legacy-' || id")
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_submissions_student ON submissions (student_id)')
+
+def _migrate_v5(cursor):
+    # One row per sitting moved out by archive_exams.py, kept for reporting
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_summaries (
+            sitting_id TEXT PRIMARY KEY,
+            exam_id TEXT NOT NULL,
+            started_at_ms INTEGER,
+            ended_at_ms INTEGER,
+            students INTEGER NOT NULL,
+            submissions INTEGER NOT NULL,
+            attempts INTEGER NOT NULL,
+            avg_score REAL,
+            max_score INTEGER,
+            perfect_scores INTEGER NOT NULL,
+            archive_path TEXT NOT NULL,
+            archived_at_ms INTEGER NOT NULL
+        )
+    ''')
+
+def _migrate_v6(cursor):
+    # Tokens come from the client, so they are only unique per student: one
+    # student's token must never swallow another's submission. SQLite can't
+    # change a constraint in place, so the table is rebuilt.
+    cursor.execute('''
+        CREATE TABLE submission_history_v6 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            submission_token TEXT NOT NULL,
+            exam_id TEXT,
+            answers TEXT,
+            score INTEGER,
+            submitted_at_ms INTEGER,
+            UNIQUE (student_id, submission_token),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO submission_history_v6
+        (id, student_id, submission_token, exam_id, answers, score, submitted_at_ms)
+        SELECT id, student_id, submission_token, exam_id, answers, score, submitted_at_ms
+        FROM submission_history
+    ''')
+    cursor.execute('DROP TABLE submission_history')
+    cursor.execute('ALTER TABLE submission_history_v6 RENAME TO submission_history')
+
+# Schema migrations in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+    _migrate_v5,
+    _migrate_v6,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def ensure_schema():
+    """Apply any pending migrations and return the resulting schema version.
+
+    Each migration runs in one explicit transaction together with its
+    user_version bump (sqlite3 would otherwise autocommit the DDL), so a
+    migration that fails leaves the database exactly at the previous version.
+    """
+    conn = get_db_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        cursor = conn.cursor()
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                MIGRATIONS[target - 1](cursor)
+                cursor.execute(f'PRAGMA user_version = {target}')
+                cursor.execute('COMMIT')
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+    finally:
+        conn.isolation_level = isolation_level
+    return max(version, SCHEMA_VERSION)
+
+def ensure_schema_locked():
+    """Run ensure_schema() holding an exclusive file lock.
+
+    Workers start in parallel; the first one through the lock migrates and
+    the rest only see an up-to-date user_version.
+    """
+    if fcntl is None:
+        return ensure_schema()
+    with open(DB_PATH + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            return ensure_schema()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,186 @@
+# ctf-lab/web/exam_packs.py
+"""
+Exam-content packs for the CTF Lab
+
+Each JSON file in web/exams/ describes one scenario: the target, its services
+and their virtual filesystems, the questions and how answers are matched.
+Packs are parsed and compiled once at startup into an immutable index that
+both the grader and the terminal read from, so switching exams (or running
+several side by side) is a matter of dropping in a file.
+"""
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+from types import MappingProxyType
+
+EXAM_DIR = os.environ.get('CTF_EXAM_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exams'))
+
+# Answers are stored in these submissions columns, so questions must use these ids
+ANSWER_COLUMNS = ('q1', 'q2', 'q3', 'q4', 'q5', 'q6')
+
+CLIENTS = ('ftp', 'smb', 'telnet')
+
+NMAP_HEADER = '''Starting Nmap 7.80 ( https://nmap.org ) at 2023-12-15 10:30 UTC
+Nmap scan report for {ip}
+Host is up (0.001s latency).
+Not shown: {closed} closed ports
+PORT     STATE SERVICE     VERSION'''
+
+NMAP_FOOTER = '''Service Info: OS: {os}; CPE: cpe:/o:linux:linux_kernel
+
+Service detection performed. Please report any incorrect results at https://nmap.org/submit/ .
+Nmap done: 1 IP address (1 host up) scanned in 2.34 seconds'''
+
+
+class ExamPackError(ValueError):
+    """Raised when an exam pack file is missing fields or malformed"""
+
+
+# flag is the flag key a question is checked against, None if the answer
+# alone decides (the analytics use this to grade whole columns at once)
+Question = namedtuple('Question', ['id', 'title', 'prompt', 'placeholder', 'match', 'flag'])
+
+
+def flag_hash(roll_number):
+    """The per-student part substituted for {hash} in flag templates"""
+    return hashlib.md5(roll_number.encode()).hexdigest()[:8]
+
+
+class ExamPack(namedtuple('ExamPack', [
+        'id', 'title', 'time_limit_minutes', 'target_ip', 'flag_templates',
+        'questions', 'terminal_json'])):
+    """A compiled, read-only exam scenario"""
+    __slots__ = ()
+
+    def generate_flags(self, roll_number):
+        """Generate unique flags for a student based on their roll number"""
+        hash_base = flag_hash(roll_number)
+        return {key: template.replace('{hash}', hash_base)
+                for key, template in self.flag_templates.items()}
+
+    def grade(self, answers, flags):
+        """Return one bool per question, in question order"""
+        return [question.match(answers.get(question.id) or '', flags)
+                for question in self.questions]
+
+
+def _compile_matcher(spec, flag_keys, where):
+    kind = spec.get('type')
+    if kind == 'exact':
+        value = spec['value']
+        return lambda answer, flags: answer == value
+    if kind == 'iexact':
+        value = spec['value'].lower()
+        return lambda answer, flags: answer.lower() == value
+    if kind == 'contains_all':
+        values = tuple(v.lower() for v in spec['values'])
+        return lambda answer, flags: all(v in answer.lower() for v in values)
+    if kind == 'flag':
+        key = spec['flag']
+        if key not in flag_keys:
+            raise ExamPackError(f"{where}: unknown flag '{key}'")
+        return lambda answer, flags: answer == flags[key]
+    raise ExamPackError(f"{where}: unknown matcher type '{kind}'")
+
+
+def _nmap_output(target):
+    lines = [NMAP_HEADER.format(ip=target['ip'], closed=1000 - len(target['ports']))]
+    for port in target['ports']:
+        lines.append(f"{port['port']:<8} {port['state']:<5} {port['service']:<11} {port.get('version', '')}".rstrip())
+    lines.append(NMAP_FOOTER.format(os=target['os']))
+    return '\n'.join(lines)
+
+
+def _check_filesystem(node, where):
+    for name, child in node.items():
+        if isinstance(child, dict):
+            _check_filesystem(child, f'{where}/{name}')
+        elif not isinstance(child, str):
+            raise ExamPackError(f'{where}/{name}: files must be strings, directories objects')
+
+
+def compile_pack(raw, source='<pack>'):
+    """Validate a parsed pack and compile it into an ExamPack"""
+    try:
+        target = raw['target']
+        ip = target['ip']
+        hostname = target.get('hostname', 'ctf-lab')
+
+        def expand(text):
+            return text.replace('{ip}', ip).replace('{hostname}', hostname)
+
+        flag_templates = MappingProxyType(dict(raw['flags']))
+
+        questions = []
+        for spec in raw['questions']:
+            if spec['id'] not in ANSWER_COLUMNS:
+                raise ExamPackError(f"{source}: question id '{spec['id']}' must be one of {', '.join(ANSWER_COLUMNS)}")
+            questions.append(Question(
+                id=spec['id'],
+                title=spec['title'],
+                prompt=expand(spec['prompt']),
+                placeholder=spec.get('placeholder', ''),
+                match=_compile_matcher(spec['match'], flag_templates, f"{source}: {spec['id']}"),
+                flag=spec['match']['flag'] if spec['match'].get('type') == 'flag' else None,
+            ))
+
+        services = {}
+        for spec in raw['services']:
+            if spec['client'] not in CLIENTS:
+                raise ExamPackError(f"{source}: service '{spec['id']}' has unknown client '{spec['client']}'")
+            _check_filesystem(spec['filesystem'], f"{source}: {spec['id']}")
+            services[spec['client']] = {
+                'share': spec.get('share', ''),
+                'user': spec.get('user', 'root'),
+                'banner': [expand(line) for line in spec.get('banner', [])],
+                'login': [{'prompt': expand(step['prompt']),
+                           'expected': step['expected'],
+                           'response': expand(step.get('response', ''))}
+                          for step in spec.get('login', [])],
+                'login_failed': spec.get('login_failed', 'Login incorrect'),
+                'filesystem': spec['filesystem'],
+            }
+
+        help_lines = [f'  IP: {ip}',
+                      '  Services: ' + ', '.join(p['service'].upper() if len(p['service']) <= 4 else p['service'].title()
+                                                  for p in target['ports'])]
+        help_lines += ['  ' + expand(spec['hint']) for spec in raw['services'] if spec.get('hint')]
+
+        # The terminal payload is identical for every student (flags are
+        # resolved client-side from {flag:key} tokens), so serialize it once.
+        terminal_json = json.dumps({
+            'ip': ip,
+            'hostname': hostname,
+            'nmap': _nmap_output(target),
+            'help': '\n'.join(help_lines),
+            'services': services,
+        }).replace('</', '<\\/')
+
+        return ExamPack(
+            id=raw['id'],
+            title=raw.get('title', 'CTF Lab Exam'),
+            time_limit_minutes=int(raw.get('time_limit_minutes', 30)),
+            target_ip=ip,
+            flag_templates=flag_templates,
+            questions=tuple(questions),
+            terminal_json=terminal_json,
+        )
+    except KeyError as e:
+        raise ExamPackError(f'{source}: missing field {e}') from None
+
+
+def load_exam_index(directory=EXAM_DIR):
+    """Parse and compile every pack in a directory into a read-only {id: ExamPack} map"""
+    packs = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, 'r') as f:
+            pack = compile_pack(json.load(f), source=filename)
+        if pack.id in packs:
+            raise ExamPackError(f"{filename}: duplicate exam id '{pack.id}'")
+        packs[pack.id] = pack
+    return MappingProxyType(packs)
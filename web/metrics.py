@@ -0,0 +1,74 @@
+# ctf-lab/web/metrics.py
+"""
+In-process metrics for the CTF Lab
+
+Timers and gauges are kept per worker process and served as JSON from
+/api/metrics, so each gunicorn worker reports its own numbers. Requests also
+accumulate per-phase timings in flask.g for the access log and the
+Server-Timing header.
+"""
+
+import os
+import threading
+
+from flask import g, has_request_context
+
+
+class Timer:
+    """Running count, total and max of a duration in milliseconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+                'max_ms': round(self.max_ms, 3),
+                'total_ms': round(self.total_ms, 3),
+            }
+
+
+_timers = {}
+_gauges = {}
+_registry_lock = threading.Lock()
+
+
+def timer(name):
+    """Return the named timer, creating it on first use"""
+    t = _timers.get(name)
+    if t is None:
+        with _registry_lock:
+            t = _timers.setdefault(name, Timer())
+    return t
+
+
+def set_gauge(name, value):
+    _gauges[name] = value
+
+
+def add_phase(name, ms):
+    """Charge ms to a phase (db, hash, render) of the current request"""
+    if has_request_context():
+        phases = g.setdefault('phases', {})
+        phases[name] = phases.get(name, 0.0) + ms
+
+
+def snapshot():
+    """All metrics for this worker as a JSON-ready dict"""
+    return {
+        'pid': os.getpid(),
+        'timers': {name: t.snapshot() for name, t in sorted(_timers.items())},
+        'gauges': dict(sorted(_gauges.items())),
+    }
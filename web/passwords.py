@@ -0,0 +1,95 @@
+# ctf-lab/web/passwords.py
+"""
+Password hashing policy for the CTF Lab
+
+At startup the host is benchmarked and a pbkdf2:sha256 iteration count is
+chosen so one verify costs about CTF_HASH_TARGET_MS (default 50 ms), but
+never fewer than MIN_ITERATIONS. Stored hashes well below the policy cost are
+rehashed on the next successful login (stronger ones are kept), and every verify is timed into the metrics so workers can be sized for
+a login storm.
+"""
+
+import hashlib
+import os
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import metrics
+
+TARGET_VERIFY_MS = float(os.environ.get('CTF_HASH_TARGET_MS', 50))
+# Werkzeug 2.2's default; a fast host raises the cost, a slow one never lowers it below this
+MIN_ITERATIONS = 260_000
+MAX_ITERATIONS = 2_000_000
+PROBE_ITERATIONS = 20_000
+
+# Hashes down to this factor below the policy cost are left alone, so nodes
+# whose calibrations differ slightly don't keep rehashing each other's passwords.
+REHASH_TOLERANCE = 1.25
+
+_policy = {'iterations': None}
+
+
+def calibrate(target_ms=TARGET_VERIFY_MS):
+    """Return the iteration count whose verify takes about target_ms on this host"""
+    salt = os.urandom(16)
+    best = float('inf')
+    for _ in range(3):
+        started = time.perf_counter()
+        hashlib.pbkdf2_hmac('sha256', b'calibration', salt, PROBE_ITERATIONS)
+        best = min(best, time.perf_counter() - started)
+    iterations = int(target_ms / 1000 / best * PROBE_ITERATIONS)
+    # Round so hosts with near-identical speed settle on the same policy
+    iterations = round(iterations, -4)
+    return max(MIN_ITERATIONS, min(MAX_ITERATIONS, iterations))
+
+
+def configure(iterations=None):
+    """Set the policy, benchmarking the host unless iterations is given"""
+    if iterations is None:
+        env = os.environ.get('CTF_HASH_ITERATIONS')
+        iterations = int(env) if env else calibrate()
+    _policy['iterations'] = iterations
+    metrics.set_gauge('hash_iterations', iterations)
+    metrics.set_gauge('hash_target_ms', TARGET_VERIFY_MS)
+    return iterations
+
+
+def current_method():
+    if _policy['iterations'] is None:
+        configure()
+    return f"pbkdf2:sha256:{_policy['iterations']}"
+
+
+def hash_password(password):
+    """Hash a password with the current policy"""
+    started = time.perf_counter()
+    hashed = generate_password_hash(password, method=current_method())
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    metrics.timer('password_hash').observe(elapsed_ms)
+    metrics.add_phase('hash', elapsed_ms)
+    return hashed
+
+
+def verify_password(stored_hash, password):
+    """Check a password against its stored hash, recording the verify time"""
+    started = time.perf_counter()
+    ok = check_password_hash(stored_hash, password)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    metrics.timer('password_verify').observe(elapsed_ms)
+    metrics.add_phase('hash', elapsed_ms)
+    return ok
+
+
+def needs_rehash(stored_hash):
+    """True if a stored hash uses another algorithm or a cost well below the policy.
+
+    A stronger hash (e.g. Werkzeug's 600k default) is never rewritten at the
+    lower calibrated cost.
+    """
+    method = stored_hash.split('$', 1)[0]
+    algorithm, _, iterations = method.rpartition(':')
+    current = current_method()
+    if algorithm != current.rpartition(':')[0] or not iterations.isdigit():
+        return True
+    return int(iterations) * REHASH_TOLERANCE < _policy['iterations']
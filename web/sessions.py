@@ -0,0 +1,278 @@
+# ctf-lab/web/sessions.py
+"""
+Server-side sessions for the CTF Lab
+
+Enabled with CTF_SESSION_STORE=server. Logged-in sessions are kept in a
+bounded LRU map whose records expire at the student's exam deadline (plus a
+grace period for the results page); the browser only holds a short opaque id.
+Anonymous sessions (flash messages before login) stay in Flask's signed
+cookie.
+
+With CTF_SESSION_FILE=<path> records are also written through to a small
+SQLite file, so they survive worker restarts and are shared by all workers.
+Each logout is appended to a revocations table and grows <path>.revoked by a
+byte; other workers notice the size change and evict just the revoked ids
+(or everything, after a mass logout) from their cache.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface
+
+import metrics
+from timekeeping import now_ms
+
+SID_COOKIE = 'sid'
+SWEEP_INTERVAL_MS = 60_000
+
+# Revocations are kept this long; a worker idle for longer drops its cache
+REVOCATION_KEEP_MS = 3600_000
+
+
+class ServerSession(SecureCookieSession):
+    """A session whose data lives in the store, identified by sid"""
+
+    def __init__(self, initial=None, sid=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.owner = self.get('student_id')
+        self.regenerate = False
+
+
+def regenerate(session):
+    """Have the session saved under a fresh id; call on every login"""
+    if isinstance(session, ServerSession):
+        session.regenerate = True
+
+
+class SessionStore:
+    """Bounded LRU of sid -> (expires_ms, record), optionally backed by a file"""
+
+    def __init__(self, capacity=4096, path=None):
+        self.capacity = capacity
+        self.path = path
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_sweep = 0
+        self._revoked_seen = self._revoked_mark()
+        self._revoked_seq = 0
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._file().execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_ms INTEGER NOT NULL
+                )
+            ''')
+            self._file().execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_ms)')
+            # sid NULL means every session was revoked
+            self._file().execute('''
+                CREATE TABLE IF NOT EXISTS revocations (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sid TEXT,
+                    at_ms INTEGER NOT NULL
+                )
+            ''')
+            self._file().commit()
+            self._revoked_seq = self._file().execute('SELECT COALESCE(MAX(seq), 0) FROM revocations').fetchone()[0]
+
+    def _file(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _revoked_mark(self):
+        if not self.path:
+            return 0
+        try:
+            return os.stat(self.path + '.revoked').st_size
+        except FileNotFoundError:
+            return 0
+
+    def _revoke(self, conn, sid):
+        # Committed together with the delete it records
+        conn.execute('INSERT INTO revocations (sid, at_ms) VALUES (?, ?)', (sid, now_ms()))
+        conn.commit()
+        # One byte per revocation: the size is a counter that, unlike an
+        # mtime, can't miss two revocations within one clock tick
+        with open(self.path + '.revoked', 'ab') as f:
+            f.write(b'.')
+
+    def _apply_revocations(self, mark):
+        """Evict the ids revoked (by any worker) since we last looked"""
+        rows = self._file().execute('SELECT seq, sid FROM revocations WHERE seq > ? ORDER BY seq',
+                                    (self._revoked_seq,)).fetchall()
+        with self._lock:
+            if rows and rows[0][0] != self._revoked_seq + 1:
+                # Sequence numbers have no gaps, so some revocations we never
+                # saw were already pruned: nothing cached can be trusted
+                self._records.clear()
+            for seq, sid in rows:
+                if sid is None:
+                    self._records.clear()
+                else:
+                    self._records.pop(sid, None)
+                self._revoked_seq = seq
+            self._revoked_seen = mark
+            self._publish()
+
+    def _publish(self):
+        metrics.set_gauge('sessions_cached', len(self._records))
+        metrics.set_gauge('sessions_capacity', self.capacity)
+        metrics.set_gauge('sessions_evicted', self.evictions)
+        metrics.set_gauge('sessions_file_reads', self.misses)
+
+    def get(self, sid, now=None):
+        """Return a copy of the record for sid, or None if unknown or expired"""
+        if now is None:
+            now = now_ms()
+        if self.path:
+            mark = self._revoked_mark()
+            if mark != self._revoked_seen:
+                # Someone logged out: drop our copies of those sessions
+                self._apply_revocations(mark)
+        with self._lock:
+            entry = self._records.get(sid)
+            if entry is not None:
+                if entry[0] > now:
+                    self._records.move_to_end(sid)
+                    self.hits += 1
+                    return dict(entry[1])
+                del self._records[sid]
+        if not self.path:
+            return None
+        self.misses += 1
+        row = self._file().execute('SELECT data, expires_ms FROM sessions WHERE sid = ? AND expires_ms > ?',
+                                   (sid, now)).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        self._cache(sid, row[1], record)
+        return dict(record)
+
+    def _cache(self, sid, expires_ms, record):
+        with self._lock:
+            self._records[sid] = (expires_ms, record)
+            self._records.move_to_end(sid)
+            while len(self._records) > self.capacity:
+                self._records.popitem(last=False)
+                self.evictions += 1
+            self._publish()
+
+    def put(self, sid, record, expires_ms):
+        now = now_ms()
+        if now >= self._next_sweep:
+            self.sweep(now)
+        self._cache(sid, expires_ms, dict(record))
+        if self.path:
+            conn = self._file()
+            conn.execute('INSERT OR REPLACE INTO sessions (sid, data, expires_ms) VALUES (?, ?, ?)',
+                         (sid, json.dumps(record), expires_ms))
+            conn.commit()
+
+    def delete(self, sid):
+        with self._lock:
+            self._records.pop(sid, None)
+            self._publish()
+        if self.path:
+            conn = self._file()
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+            self._revoke(conn, sid)
+
+    def clear(self):
+        """Log everyone out, e.g. at the end of an exam"""
+        with self._lock:
+            count = len(self._records)
+            self._records.clear()
+            self._publish()
+        if self.path:
+            conn = self._file()
+            count = conn.execute('DELETE FROM sessions').rowcount
+            self._revoke(conn, None)
+        return count
+
+    def sweep(self, now=None):
+        """Drop every record whose exam (plus grace) has ended"""
+        if now is None:
+            now = now_ms()
+        self._next_sweep = now + SWEEP_INTERVAL_MS
+        with self._lock:
+            expired = [sid for sid, (expires_ms, _) in self._records.items() if expires_ms <= now]
+            for sid in expired:
+                del self._records[sid]
+            self._publish()
+        if self.path:
+            conn = self._file()
+            conn.execute('DELETE FROM sessions WHERE expires_ms <= ?', (now,))
+            conn.execute('DELETE FROM revocations WHERE at_ms <= ?', (now - REVOCATION_KEEP_MS,))
+            conn.commit()
+
+    def stats(self):
+        stats = {'cached': len(self._records), 'capacity': self.capacity,
+                 'evictions': self.evictions, 'hits': self.hits, 'file_reads': self.misses}
+        if self.path:
+            stats['stored'] = self._file().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        return stats
+
+
+class ServerSessionInterface(SecureCookieSessionInterface):
+    """Keeps logged-in sessions in a SessionStore behind an opaque cookie"""
+
+    def __init__(self, store, grace_ms=15 * 60_000, idle_ttl_ms=3 * 3600_000):
+        self.store = store
+        self.grace_ms = grace_ms
+        self.idle_ttl_ms = idle_ttl_ms
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(SID_COOKIE)
+        if sid:
+            record = self.store.get(sid)
+            if record is not None:
+                return ServerSession(record, sid=sid)
+        return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        sid = getattr(session, 'sid', None)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if 'student_id' not in session:
+            # Logged out (or never logged in): drop any server record and
+            # let the signed cookie carry whatever is left, e.g. flashes
+            if sid:
+                self.store.delete(sid)
+                response.delete_cookie(SID_COOKIE, domain=domain, path=path)
+            return super().save_session(app, session, response)
+
+        if sid is not None and (session.regenerate or session['student_id'] != session.owner):
+            # Logging in on a browser that still holds a session: never keep
+            # its id (session fixation), retire it everywhere
+            self.store.delete(sid)
+            sid = None
+
+        if sid is None:
+            # Fresh login: new id and no more signed cookie
+            sid = secrets.token_urlsafe(16)
+            response.delete_cookie(app.config['SESSION_COOKIE_NAME'], domain=domain, path=path)
+            response.set_cookie(SID_COOKIE, sid, domain=domain, path=path,
+                                httponly=self.get_cookie_httponly(app),
+                                secure=self.get_cookie_secure(app),
+                                samesite=self.get_cookie_samesite(app))
+        elif not session.modified:
+            return
+
+        deadline = session.get('deadline')
+        expires_ms = deadline + self.grace_ms if deadline else now_ms() + self.idle_ttl_ms
+        self.store.put(sid, dict(session), expires_ms)
@@ -0,0 +1,53 @@
+# ctf-lab/web/timekeeping.py
+"""
+Exam clock for the CTF Lab
+
+Every timestamp and deadline is an integer count of milliseconds since the
+Unix epoch (UTC), so a deadline check is a single integer comparison and all
+nodes agree on it whatever their local timezone.
+"""
+
+import time
+from datetime import datetime, timezone
+
+# Anchor the monotonic clock to the epoch once per process, so NTP slews or a
+# manual clock change after startup cannot stretch or cut short an exam.
+_EPOCH_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+def now_ms():
+    """Current time in epoch milliseconds, from the monotonic clock"""
+    return (time.monotonic_ns() + _EPOCH_OFFSET_NS) // 1_000_000
+
+
+def deadline_after(minutes, start_ms=None):
+    """Deadline `minutes` after start_ms (default: now)"""
+    if start_ms is None:
+        start_ms = now_ms()
+    return start_ms + minutes * 60_000
+
+
+def remaining_ms(deadline_ms, now=None):
+    """Milliseconds left until deadline_ms, never negative"""
+    if now is None:
+        now = now_ms()
+    return max(0, deadline_ms - now)
+
+
+def is_expired(deadline_ms, now=None):
+    """True once deadline_ms has passed; a missing deadline never expires"""
+    if deadline_ms is None:
+        return False
+    if now is None:
+        now = now_ms()
+    return now >= deadline_ms
+
+
+def from_iso(value):
+    """Convert a legacy naive-local ISO timestamp to epoch milliseconds"""
+    return int(datetime.fromisoformat(value).timestamp() * 1000)
+
+
+def to_iso(ms):
+    """Format epoch milliseconds as a UTC ISO timestamp for display"""
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat(timespec='seconds')